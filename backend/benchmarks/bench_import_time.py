@@ -0,0 +1,103 @@
+"""
+Benchmark: cold-start import time of the backend, measured with `python -X importtime`.
+
+Imports the app module in fresh interpreters (no API keys in the environment, as in CI) and reports:
+* the median and fastest cumulative import time of the module
+* the slowest imports below it (by cumulative time, from the median run)
+
+With --record, the result is appended to a JSONL history file (one line per run, tagged with the
+git commit), and the change against the previous entry is printed, so cold-start regressions
+show up between releases.
+
+Usage (from the backend directory):
+    python benchmarks/bench_import_time.py [--repeat N] [--module main] [--top N] [--record benchmarks/import_time.jsonl]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# "import time:  self [us] | cumulative | imported package", nesting shown by indentation
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+def measure(module):
+    """
+    Imports the module in a fresh interpreter. Returns {name: (self_us, cumulative_us, depth)}.
+    """
+    env = {k: v for k, v in os.environ.items() if not k.endswith("_API_KEY") and k != "YELLOWCAKE_APIKEY"}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{completed.stderr}")
+
+    imports = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return imports
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=BACKEND_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--module", default="main")
+    arg_parser.add_argument("--repeat", type=int, default=7)
+    arg_parser.add_argument("--top", type=int, default=15)
+    arg_parser.add_argument("--record", type=Path, help="JSONL history file to append the result to")
+    args = arg_parser.parse_args()
+
+    # The first run also warms the OS file cache; it is not counted
+    measure(args.module)
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    totals = [run[args.module][1] / 1000 for run in runs]
+    median_ms = statistics.median(totals)
+    median_run = min(runs, key=lambda run: abs(run[args.module][1] / 1000 - median_ms))
+
+    print(f"import {args.module}: median {median_ms:.1f} ms, fastest {min(totals):.1f} ms ({args.repeat} runs)")
+    print(f"\n{'module':<50} {'cumulative ms':>14} {'self ms':>9}")
+    slowest = sorted(
+        ((name, timing) for name, timing in median_run.items() if name != args.module),
+        key=lambda item: item[1][1], reverse=True
+    )[:args.top]
+    for name, (self_us, cumulative_us, depth) in slowest:
+        print(f"{'  ' * (depth - 1) + name:<50} {cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}")
+
+    if args.record:
+        previous = None
+        if args.record.exists():
+            lines = args.record.read_text().splitlines()
+            previous = json.loads(lines[-1]) if lines else None
+        entry = {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "module": args.module,
+            "median_ms": round(median_ms, 1),
+            "fastest_ms": round(min(totals), 1),
+            "slowest_imports": {name: round(timing[1] / 1000, 1) for name, timing in slowest[:5]},
+        }
+        with open(args.record, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        if previous and previous.get("module") == args.module:
+            change = median_ms - previous["median_ms"]
+            print(f"\nvs {previous.get('commit')} ({previous['date']}): {change:+.1f} ms")
+
+if __name__ == "__main__":
+    main()
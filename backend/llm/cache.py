@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import hashlib
+from collections import OrderedDict
+
+from llm.singleflight import normalize_prompt
+from llm.semantic_cache import semantic_cache, SEMANTIC_CACHE_ENABLED
+from llm.disk_cache import disk_cache
+from utils import metrics
+
+def cache_key(model, system_instruction, prompt, params):
+    """
+    Builds the exact-match cache key for a deterministic call.
+    """
+    raw = json.dumps(
+        [model, system_instruction, normalize_prompt(prompt), params],
+        sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Bounded in-memory response cache with TTL and LRU eviction.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl  # Seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+
+    def get(self, key, max_age=None):
+        """
+        Returns the cached value, or None if missing, expired, or older than max_age seconds.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, value = entry
+        age = time.time() - stored_at
+        if age > self.ttl:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        if max_age is not None and age > max_age:
+            # Too old for this caller, but still fine for others
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, stored_at=None):
+        # stored_at lets entries promoted from another tier keep their original age
+        self._entries[key] = (stored_at or time.time(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+# Shared by every request in this process
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+)
+
+async def lookup_cached(key, model, prompt, max_age=None):
+    """
+    Looks a call up in memory, then on disk, then (if enabled) in the semantic cache.
+    Returns the cached result tagged with its cache_tier, or None.
+    """
+    cached = response_cache.get(key, max_age=max_age)
+    metrics.increment("response_cache_lookups_total", result="hit" if cached else "miss")
+    if cached is not None:
+        return {**cached, "cache_tier": "exact"}
+
+    if disk_cache is not None:
+        # Shared with the other workers and kept across restarts
+        row = await disk_cache.aget(key, max_age=max_age)
+        metrics.increment("disk_cache_lookups_total", result="hit" if row else "miss")
+        if row is not None:
+            cached, stored_at = row
+            response_cache.set(key, cached, stored_at=stored_at)
+            return {**cached, "cache_tier": "disk"}
+
+    if SEMANTIC_CACHE_ENABLED:
+        # Near-duplicate prompts ("capital of france?") can reuse an earlier answer
+        similar, similarity = semantic_cache.lookup(model, prompt, max_age=max_age)
+        if similar is not None:
+            return {**similar, "cache_tier": "semantic", "similarity": round(similarity, 4)}
+    return None
+
+async def store_cached(key, model, prompt, result):
+    """
+    Stores a successful result in every enabled cache tier.
+    """
+    response_cache.set(key, result)
+    if disk_cache is not None:
+        await disk_cache.aset(key, result)
+    if SEMANTIC_CACHE_ENABLED:
+        semantic_cache.add(model, prompt, result)
+
+def cache_stats():
+    return {
+        "exact": response_cache.stats(),
+        "disk": disk_cache.stats() if disk_cache is not None else {"enabled": False},
+        "semantic": {"enabled": SEMANTIC_CACHE_ENABLED, **semantic_cache.stats()},
+    }
@@ -0,0 +1,144 @@
+import os
+import time
+from collections import deque
+
+from utils.logger import get_logger
+from utils import metrics
+
+# Initialize logger
+logger = get_logger("CircuitBreaker")
+
+# A circuit opens when at least CIRCUIT_MIN_CALLS of the last CIRCUIT_WINDOW calls (within CIRCUIT_WINDOW_SECONDS)
+# failed at a rate of CIRCUIT_FAILURE_RATE or more; after CIRCUIT_OPEN_SECONDS it lets probe calls through
+CIRCUIT_BREAKER_ENABLED = os.getenv("CIRCUIT_BREAKER_ENABLED", "1").lower() in ("1", "true", "yes")
+CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", "20"))
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "60"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_HALF_OPEN_PROBES = int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "1"))
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a model (or provider) that is known to be failing."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is unavailable (recent calls failed), retrying in {retry_after:.0f}s.")
+        self.name = name
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker over a rolling window of call outcomes.
+    closed: calls go through, outcomes are counted.
+    open: calls fail immediately until open_seconds have passed.
+    half-open: up to max_probes calls go through; a success closes the circuit, a failure opens it again.
+    Only used from the event loop, so it needs no locking.
+    """
+
+    def __init__(self, name, window=20, window_seconds=60.0, min_calls=5, failure_rate=0.5, open_seconds=30.0, max_probes=1):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.max_probes = max_probes
+        self._outcomes = deque(maxlen=window)  # (time, failed)
+        self._opened_at = None
+        self._probes = 0
+        self.opened_total = 0
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.open_seconds:
+            return "open"
+        return "half_open"
+
+    def _recent(self):
+        horizon = time.monotonic() - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < horizon:
+            self._outcomes.popleft()
+        return self._outcomes
+
+    def retry_after(self):
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def check(self):
+        """
+        Raises CircuitOpen if a call would be refused right now (does not reserve a probe).
+        """
+        state = self.state
+        if state == "open" or (state == "half_open" and self._probes >= self.max_probes):
+            raise CircuitOpen(self.name, max(self.retry_after(), 1.0))
+
+    def acquire(self):
+        """
+        Admits one call. Returns True if it is a half-open probe; raises CircuitOpen if refused.
+        A probe must end with record(..., probe=True) or release().
+        """
+        self.check()
+        if self.state == "half_open":
+            self._probes += 1
+            return True
+        return False
+
+    def release(self):
+        """
+        Gives back a probe slot without an outcome (e.g. the probe was cancelled).
+        """
+        self._probes = max(0, self._probes - 1)
+
+    def record(self, failed, probe=False):
+        if probe:
+            self.release()
+            if self.state != "half_open":
+                return
+            if failed:
+                self._open("probe failed")
+            else:
+                logger.info(f"Circuit for {self.name} closed (probe succeeded)")
+                self._opened_at = None
+                self._probes = 0
+            return
+        if self._opened_at is not None:
+            # Call admitted before the circuit opened - the probes decide now
+            return
+
+        self._outcomes.append((time.monotonic(), failed))
+        recent = self._recent()
+        failures = sum(1 for _, f in recent if f)
+        if len(recent) >= self.min_calls and failures / len(recent) >= self.failure_rate:
+            self._open(f"{failures} of the last {len(recent)} calls failed")
+
+    def _open(self, reason):
+        self._opened_at = time.monotonic()
+        self._probes = 0
+        self._outcomes.clear()
+        self.opened_total += 1
+        metrics.increment("circuit_opened_total", circuit=self.name)
+        logger.warning(f"Circuit for {self.name} opened for {self.open_seconds:.0f}s: {reason}")
+
+    def stats(self):
+        recent = self._recent()
+        failures = sum(1 for _, f in recent if f)
+        return {
+            "state": self.state,
+            "recent_calls": len(recent),
+            "recent_failure_rate": round(failures / len(recent), 3) if recent else 0.0,
+            "retry_after_seconds": round(self.retry_after(), 1),
+            "opened_total": self.opened_total,
+        }
+
+def breaker_from_env(name):
+    return CircuitBreaker(
+        name,
+        window=CIRCUIT_WINDOW,
+        window_seconds=CIRCUIT_WINDOW_SECONDS,
+        min_calls=CIRCUIT_MIN_CALLS,
+        failure_rate=CIRCUIT_FAILURE_RATE,
+        open_seconds=CIRCUIT_OPEN_SECONDS,
+        max_probes=CIRCUIT_HALF_OPEN_PROBES,
+    )
@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+
+from utils.logger import get_logger
+from utils import metrics
+from utils.thread_pool import InstrumentedThreadPoolExecutor
+
+# Initialize logger
+logger = get_logger("DiskCache")
+
+class DiskResponseCache:
+    """
+    Persistent response cache in a SQLite file (WAL mode), shared by every uvicorn worker
+    on the host and kept across restarts. Expired rows are swept periodically and the
+    table is trimmed to max_entries by least recent use.
+    """
+
+    def __init__(self, path, ttl=3600.0, max_entries=100_000, sweep_every=200):
+        self.path = path
+        self.ttl = ttl  # Seconds
+        self.max_entries = max_entries
+        self.sweep_every = sweep_every  # Writes between sweeps
+        self._writes = 0
+        self._local = threading.local()
+        # SQLite calls are quick but can block on a busy lock - keep them off the event loop
+        # and out of the default thread pool used by provider calls
+        self._executor = InstrumentedThreadPoolExecutor(max_workers=2, thread_name_prefix="disk-cache")
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._connect().execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    def _connect(self):
+        # sqlite3 connections can't be shared between threads, so each thread opens its own
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key, max_age=None):
+        """
+        Returns (value, stored_at), or None if missing, expired, or older than max_age seconds.
+        """
+        connection = self._connect()
+        row = connection.execute("SELECT value, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        value, stored_at = row
+        now = time.time()
+        age = now - stored_at
+        if age > self.ttl or (max_age is not None and age > max_age):
+            return None
+
+        connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(value), stored_at
+
+    def set(self, key, value):
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO responses (key, value, stored_at, last_used) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now, now)
+        )
+        self._writes += 1
+        if self._writes % self.sweep_every == 0:
+            self.sweep()
+
+    def sweep(self):
+        """
+        Deletes expired rows, then the least recently used rows beyond max_entries.
+        """
+        connection = self._connect()
+        expired = connection.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - self.ttl,)).rowcount
+        trimmed = connection.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        if expired or trimmed:
+            logger.info(f"Swept disk cache: {expired} expired, {trimmed} over the size cap")
+
+    def stats(self):
+        (entries,) = self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()
+        return {"path": self.path, "entries": entries, "max_entries": self.max_entries, "ttl_seconds": self.ttl}
+
+    async def aget(self, key, max_age=None):
+        """
+        Non-blocking get. Disk errors are logged and treated as a miss.
+        """
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self.get, key, max_age)
+        except sqlite3.Error as e:
+            metrics.increment("disk_cache_errors_total", operation="get")
+            logger.warning(f"Disk cache read failed: {str(e)}")
+            return None
+
+    async def aset(self, key, value):
+        """
+        Non-blocking set. Disk errors are logged and ignored.
+        """
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.set, key, value)
+        except sqlite3.Error as e:
+            metrics.increment("disk_cache_errors_total", operation="set")
+            logger.warning(f"Disk cache write failed: {str(e)}")
+
+# Disabled unless a path is configured
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "")
+
+disk_cache = DiskResponseCache(
+    RESPONSE_CACHE_PATH,
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("RESPONSE_CACHE_DISK_MAX_ENTRIES", "100000")),
+) if RESPONSE_CACHE_PATH else None
@@ -0,0 +1,115 @@
+import os
+import asyncio
+
+from utils.logger import get_logger
+from utils import metrics
+from llm.latency import latency_tracker
+
+# Initialize logger
+logger = get_logger("Hedging")
+
+# Quantile of observed latency after which a hedge is sent
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+# Delay used until a model has enough latency samples (seconds)
+HEDGE_DELAY_SECONDS = float(os.getenv("HEDGE_DELAY_SECONDS", "8"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+def _parse_hedge_models(raw):
+    """
+    Parses HEDGE_MODELS, e.g. "openai/o1-preview=openrouter/auto,meta-llama/llama-3.1-405b-instruct".
+    A model without "=alternate" is hedged against itself.
+    """
+    policies = {}
+    for entry in raw.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        model, _, alternate = entry.partition("=")
+        policies[model.strip()] = alternate.strip() or model.strip()
+    return policies
+
+# Hedging is opt-in: only models listed here ever get a second attempt
+HEDGE_POLICIES = _parse_hedge_models(os.getenv("HEDGE_MODELS", ""))
+
+def hedge_target(model):
+    """
+    Returns the model to send the hedge to, or None if the model is not hedged.
+    """
+    return HEDGE_POLICIES.get(model)
+
+def hedge_delay(model):
+    """
+    Returns how long to wait for the primary attempt before hedging.
+    """
+    observed = latency_tracker.percentile(model, HEDGE_PERCENTILE, min_samples=HEDGE_MIN_SAMPLES)
+    return observed if observed is not None else HEDGE_DELAY_SECONDS
+
+async def hedged_call(model, attempt, on_delta=None):
+    """
+    Runs attempt(model, on_delta, is_hedge=False) and, if it is still silent after hedge_delay(model),
+    a second attempt against the configured alternate. The first successful result wins
+    and the other attempt is cancelled.
+
+    attempt must return a result dict (with "error" on failure) rather than raise.
+    The result gets "hedged" (a second attempt was sent) and "hedge_won" flags,
+    plus "requested_model" since the winner may be a different model.
+    """
+    alternate = hedge_target(model)
+
+    # The first attempt to produce a delta owns the token stream, the other one is muted
+    stream_owner = None
+    started_streaming = asyncio.Event()
+
+    def delta_for(name):
+        if on_delta is None:
+            return None
+
+        def forward(text):
+            nonlocal stream_owner
+            if stream_owner is None:
+                stream_owner = name
+                started_streaming.set()
+            if stream_owner == name:
+                on_delta(text)
+        return forward
+
+    primary = asyncio.create_task(attempt(model, delta_for("primary"), is_hedge=False))
+    attempts = {primary: "primary"}
+    try:
+        # Wait for the primary to finish or (in streaming mode) to start producing tokens
+        first_token = asyncio.create_task(started_streaming.wait())
+        try:
+            await asyncio.wait({primary, first_token}, timeout=hedge_delay(model), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            first_token.cancel()
+
+        if not primary.done() and stream_owner is None:
+            logger.info(f"Hedging {model} with {alternate} after {hedge_delay(model):.1f}s")
+            metrics.increment("hedges_sent_total", model=model)
+            hedge = asyncio.create_task(attempt(alternate, delta_for("hedge"), is_hedge=True))
+            attempts[hedge] = "hedge"
+
+        pending = set(attempts)
+        result = None
+        winner = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    candidate = task.result()
+                except Exception as e:
+                    candidate = {"model": model, "error": str(e)}
+                if result is None or ("error" in result and "error" not in candidate):
+                    result, winner = candidate, attempts[task]
+            if "error" not in result:
+                break
+    finally:
+        # Cancel the losing attempt (or both, if we were cancelled ourselves)
+        for task in attempts:
+            if not task.done():
+                task.cancel()
+
+    hedge_won = winner == "hedge"
+    if hedge_won:
+        metrics.increment("hedges_won_total", model=model)
+    return {**result, "requested_model": model, "hedged": len(attempts) > 1, "hedge_won": hedge_won}
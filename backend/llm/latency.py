@@ -0,0 +1,44 @@
+from collections import defaultdict, deque
+
+class LatencyTracker:
+    """
+    Keeps a rolling window of recent call latencies per model and kind
+    ("total" for the whole call, "first_byte" for the time to the first streamed data).
+    Only calls that finished are samples. A call cut off by its deadline is censored (its latency is unknown,
+    only that it exceeded the deadline), so it is counted separately: feeding the deadline back as a sample
+    would push the next deadline up every time a call hangs.
+    """
+
+    def __init__(self, window=200):
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._timeouts = defaultdict(int)
+
+    def record(self, model, seconds, kind="total"):
+        self._samples[(model, kind)].append(seconds)
+
+    def record_timeout(self, model, kind="total"):
+        self._timeouts[(model, kind)] += 1
+
+    def count(self, model, kind="total"):
+        return len(self._samples.get((model, kind), ()))
+
+    def timeouts(self, model, kind="total"):
+        return self._timeouts.get((model, kind), 0)
+
+    def models(self):
+        return sorted({model for model, _ in self._samples} | {model for model, _ in self._timeouts})
+
+    def percentile(self, model, q, min_samples=1, kind="total"):
+        """
+        Returns the q-th quantile (0-1) of the model's recent latencies,
+        or None when fewer than min_samples have been recorded.
+        """
+        samples = self._samples.get((model, kind))
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+# Shared by every request in this process
+latency_tracker = LatencyTracker()
@@ -0,0 +1,40 @@
+from llm.hedging import HEDGE_POLICIES
+
+# Models offered to the frontend
+AVAILABLE_MODELS = [
+    {"label": "GPT 4o", "value": "openai/gpt-4o"},
+    {"label": "GPT 4o Mini", "value": "openai/gpt-4o-mini"},
+    {"label": "O1 Preview", "value": "openai/o1-preview"},
+    {"label": "GPT 4 Turbo", "value": "openai/gpt-4-turbo"},
+    {"label": "Claude 3.5 Sonnet", "value": "anthropic/claude-3.5-sonnet"},
+    {"label": "Claude 3 Opus", "value": "anthropic/claude-3-opus"},
+    {"label": "Claude 3 Haiku", "value": "anthropic/claude-3-haiku"},
+    {"label": "Gemini Pro 1.5", "value": "google/gemini-pro-1.5"},
+    {"label": "Gemini Flash 1.5", "value": "google/gemini-flash-1.5"},
+    {"label": "LLaMA 3.1 405B Instruct", "value": "meta-llama/llama-3.1-405b-instruct"},
+    {"label": "LLaMA 3.1 70B Instruct", "value": "meta-llama/llama-3.1-70b-instruct"},
+    {"label": "LLaMA 3.1 8B Instruct", "value": "meta-llama/llama-3.1-8b-instruct"},
+    {"label": "Mistral Large 2407", "value": "mistralai/mistral-large-2407"},
+    {"label": "DeepSeek Chat", "value": "deepseek/deepseek-chat"},
+    {"label": "DeepSeek Coder", "value": "deepseek/deepseek-coder"},
+    {"label": "Mistral 7B Instruct (Free)", "value": "mistralai/mistral-7b-instruct:free"},
+    {"label": "Phi 3 Mini 128k Instruct (Free)", "value": "microsoft/phi-3-mini-128k-instruct:free"},
+    {"label": "OpenRouter Auto", "value": "openrouter/auto"},
+    {"label": "Google Gemini 2.0 Flash (Free - Direct API)", "value": "google-direct/gemini-2.0-flash-exp"},
+    {"label": "Google Gemini 1.5 Flash (Free - Direct API)", "value": "google-direct/gemini-1.5-flash"},
+    {"label": "YellowCake API (For Automation)", "value": "YellowCake"}  # Placeholder for custom models
+]
+
+# Per-model state (metric labels, circuit breakers, latency samples) is only kept for these models:
+# the offered ones plus the configured hedge targets. Any other model id a client sends shares "other",
+# so made-up ids can't grow /metrics or memory without bound.
+OTHER_MODEL = "other"
+KNOWN_MODELS = frozenset(
+    [m["value"] for m in AVAILABLE_MODELS] + list(HEDGE_POLICIES) + list(HEDGE_POLICIES.values())
+)
+
+def model_key(model):
+    """
+    Returns the name the model's metrics, circuit breaker and latency samples are kept under.
+    """
+    return model if model in KNOWN_MODELS else OTHER_MODEL
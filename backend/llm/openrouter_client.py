@@ -1,143 +1,193 @@
 import os
-import asyncio  # Needed for the timeout logic
-import sys
-from pathlib import Path
+import time
+import asyncio
+import threading
 
-# Add parent directory to path for imports
-BACKEND_DIR = Path(__file__).parent.parent
-sys.path.insert(0, str(BACKEND_DIR))
-
-from openai import AsyncOpenAI
-from dotenv import load_dotenv
-from utils.parser import parse_llm_json
+from utils.parser import parse_llm_json, PartialResponseDecoder
 from utils.logger import get_logger
+from utils import tracing
 
 # Initialize logger
 logger = get_logger("OpenRouterClient")
 
-# Import YellowCake prompt
-PROJECT_ROOT = BACKEND_DIR.parent
-sys.path.append(str(PROJECT_ROOT))
-from model.external_api import get_valid_urls, call_yellowcake
-
-# Load environment variables
-load_dotenv()
-
-# Read API key
-API_KEY = os.getenv("OPENROUTER_API_KEY")
-if not API_KEY:
-    raise ValueError("OPENROUTER_API_KEY is not set in .env")
-
-# Reusable Async client
-client = AsyncOpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=API_KEY,
-    default_headers={
-        "HTTP-Referer": "http://localhost:3000",
-        "X-Title": "LLM Side-by-Side Aggregator"
-    }
+# Reusable Async client, created on first use (or during warmup)
+_client = None
+_client_lock = threading.Lock()
+
+def get_client(max_connections=64, connect_timeout=5.0):
+    """
+    Returns the shared OpenRouter client, importing the SDK and reading the API key on first use.
+    The client gets its own connection pool of max_connections. Only connecting has a timeout here,
+    and the SDK's built-in retries are off - the provider adapter owns the other deadlines and the retry policy.
+    Raises ValueError if OPENROUTER_API_KEY is not set.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import httpx
+                from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+                from dotenv import load_dotenv
+                load_dotenv()
+
+                api_key = os.getenv("OPENROUTER_API_KEY")
+                if not api_key:
+                    raise ValueError("OPENROUTER_API_KEY is not set in .env")
+                _client = AsyncOpenAI(
+                    base_url="https://openrouter.ai/api/v1",
+                    api_key=api_key,
+                    default_headers={
+                        "HTTP-Referer": "http://localhost:3000",
+                        "X-Title": "LLM Side-by-Side Aggregator"
+                    },
+                    max_retries=0,
+                    timeout=httpx.Timeout(None, connect=connect_timeout),
+                    http_client=DefaultAsyncHttpxClient(
+                        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+                    )
+                )
+    return _client
+
+async def get_client_async(max_connections=64, connect_timeout=5.0):
+    """
+    get_client for the event loop: importing the SDK and building the client happen in a worker thread,
+    so the first call (or the warmup) doesn't stall other requests.
+    """
+    if _client is not None:
+        return _client
+    return await asyncio.to_thread(get_client, max_connections, connect_timeout)
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+# Every OpenRouter call is wrapped in the same JSON envelope
+SYSTEM_INSTRUCTION = (
+    "Task: Respond ONLY with valid JSON.\n"
+    "Format: {\"response\": \"...\"}\n"
+    "Constraint: No prose, no markdown, no conversational text."
 )
 
-async def ask_openrouter(user_input, model="openai/gpt-oss-20b:free"):
+# Sampling parameters sent with every OpenRouter call (also part of the cache key)
+COMPLETION_PARAMS = {"temperature": 0}
+
+# Ask for the token counts in the last streamed chunk
+STREAM_OPTIONS = {"include_usage": True}
+
+def _messages(user_input):
+    return [
+        {"role": "system", "content": SYSTEM_INSTRUCTION},
+        {"role": "user", "content": user_input}
+    ]
+
+async def _stream_completion(model, user_input, on_delta=None, on_first_byte=None):
     """
-    Calls OpenRouter with a strict 30-second timeout.
-    Returns model ID and parsed response or error.
+    Consumes a streamed completion, forwarding the text of the "response" field as it grows (if on_delta is given).
+    Calls on_first_byte() when the first chunk arrives.
+    Returns the full raw content, the actual model that answered, the provider-reported usage (or None)
+    and the timings of the stream in milliseconds ("ttfb_ms" and "upstream_ms").
     """
-    logger.info(f"Initiating async call for model: {model}")
-
-    # Override for Google Gemini Direct API models
-    if model.startswith("google-direct/"):
-        logger.info("Detected Google Gemini direct API model. Processing via call_gemini.")
-        try:
-            # Extract the actual model name from the identifier
-            actual_model_name = model.replace("google-direct/", "")
-            logger.info(f"Using Gemini model: {actual_model_name}")
-            
-            # Call Gemini API directly in a separate thread to avoid blocking
-            # Using empty base_prompt since this is a direct user query
-            from model.external_api import call_gemini
-            gemini_response = await asyncio.to_thread(
-                call_gemini, 
-                base_prompt="You are a helpful AI assistant. Respond to the user's query directly and naturally.",
-                user_prompt=user_input,
-                model_name=actual_model_name
-            )
-            
-            return {
-                "model": f"Google Gemini ({actual_model_name})",
-                "response": gemini_response
-            }
-        except Exception as e:
-            logger.exception(f"Error processing Google Gemini request: {str(e)}")
-            return {"model": model, "error": f"Google Gemini API error: {str(e)}"}
-
-    # Override for YellowCake model
-    if "yellowcake" in model.lower():
-        logger.info("Detected YellowCake model. Processing differently.")
-        try:
-            # Extract URLs from user input (run in thread pool since it's synchronous)
-            urls = await asyncio.to_thread(get_valid_urls, user_input)
-            if not urls:
-                logger.warning("No valid URLs found in user input for YellowCake.")
-                return {"model": model, "error": "No valid URLs found in the prompt."}
-            
-            # For simplicity, use the first valid URL
-            url_to_use = list(urls)[0]
-            logger.info(f"Calling YellowCake for URL: {url_to_use}")
-            
-            # Call YellowCake API in a separate thread to avoid blocking
-            yellowcake_response = await asyncio.to_thread(call_yellowcake, url_to_use, user_input)
-            
-            return {
-                "model": model,
-                "response": yellowcake_response
-            }
-        except Exception as e:
-            logger.exception(f"Error processing YellowCake request: {str(e)}")
-            return {"model": model, "error": f"YellowCake processing error: {str(e)}"}
-    
-    
-    system_instruction = (
-        "Task: Respond ONLY with valid JSON.\n"
-        "Format: {\"response\": \"...\"}\n"
-        "Constraint: No prose, no markdown, no conversational text."
+    started_at = time.perf_counter()
+    client = await get_client_async()
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=_messages(user_input),
+        stream=True,
+        stream_options=STREAM_OPTIONS,
+        **COMPLETION_PARAMS
     )
 
-    try:
-        # Wrap the API call in wait_for to prevent infinite hanging
-        completion = await asyncio.wait_for(
-            client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_instruction},
-                    {"role": "user", "content": user_input}
-                ],
-                temperature=0
-            ),
-            timeout=30.0  # Seconds
-        )
-        
-        raw_response = completion.choices[0].message.content
-        logger.info(f"Received raw response from {model}")
-        
-        # Get the actual model that was used (important for auto selections)
-        actual_model = completion.model if hasattr(completion, 'model') else model
-        logger.info(f"Actual model used: {actual_model}")
-
-        # Process the response
+    raw_parts = []
+    decoder = PartialResponseDecoder()
+    actual_model = model
+    usage = None
+    ttfb = None
+    async for chunk in stream:
+        if ttfb is None:
+            ttfb = time.perf_counter() - started_at
+            if on_first_byte is not None:
+                on_first_byte()
+        if getattr(chunk, "model", None):
+            actual_model = chunk.model
+        if getattr(chunk, "usage", None):
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        content = chunk.choices[0].delta.content
+        if not content:
+            continue
+        raw_parts.append(content)
+        if on_delta is None:
+            continue
+
+        # Only forward the newly decoded part of the response text
+        piece = decoder.feed(content)
+        if piece:
+            on_delta(piece)
+
+    timings = {"upstream_ms": _ms(time.perf_counter() - started_at)}
+    if ttfb is not None:
+        timings["ttfb_ms"] = _ms(ttfb)
+    return "".join(raw_parts), actual_model, usage, timings
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+def _usage_dict(usage):
+    """
+    Token counts the provider reported in the last chunk, as a plain dict (None if it sent none).
+    """
+    if usage is None:
+        return None
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+    }
+
+def _tokens_per_second(completion_tokens, timings):
+    """
+    Completion tokens over the time spent generating them (first byte to end of stream).
+    """
+    generating_ms = timings["upstream_ms"] - timings.get("ttfb_ms", 0.0)
+    if not completion_tokens or generating_ms <= 0:
+        return None
+    return round(completion_tokens / (generating_ms / 1000), 1)
+
+async def ask_openrouter(user_input, model="openai/gpt-oss-20b:free", on_delta=None, on_first_byte=None):
+    """
+    Calls OpenRouter once. Returns model ID and parsed response, or an error if the answer isn't valid JSON.
+    The completion is always streamed, so on_first_byte() can be called as soon as the model starts answering;
+    if on_delta is given, on_delta(text) is called with each new piece of the response.
+    Either way the result carries "timings" (ttfb_ms, upstream_ms, parse_ms, tokens_per_second)
+    and "usage" (the token counts reported by the provider, when it sent them).
+    Transport errors are raised; timeouts and retries are up to the caller (see llm.providers).
+    """
+    with tracing.span("openrouter.stream", model=model) as span:
+        raw_response, actual_model, usage, timings = await _stream_completion(model, user_input, on_delta, on_first_byte)
+        if span is not None:
+            span.set(actual_model=actual_model, response_chars=len(raw_response), **timings)
+    logger.info(f"Received streamed response from {model}")
+    logger.info(f"Actual model used: {actual_model}")
+
+    # Process the response
+    parse_started_at = time.perf_counter()
+    with tracing.span("openrouter.parse"):
         parsed_data = parse_llm_json(raw_response)
-        
-        if "error" in parsed_data:
-            return {"model": actual_model, "error": parsed_data["error"]}
-        
-        return {
-            "model": actual_model, 
-            "response": parsed_data.get("response", "No content provided.")
-        }
-        
-    except asyncio.TimeoutError:
-        logger.error(f"Request for {model} timed out after 30 seconds.")
-        return {"model": model, "error": "Model response timed out."}
-    except Exception as e:
-        logger.exception(f"Unexpected error for {model}: {str(e)}")
-        return {"model": model, "error": str(e)}
\ No newline at end of file
+    timings["parse_ms"] = _ms(time.perf_counter() - parse_started_at)
+
+    usage = _usage_dict(usage)
+    if usage is not None:
+        timings["tokens_per_second"] = _tokens_per_second(usage["completion_tokens"], timings)
+    metadata = {"timings": timings, "usage": usage}
+
+    if "error" in parsed_data:
+        return {"model": actual_model, "error": parsed_data["error"], **metadata}
+
+    return {
+        "model": actual_model,
+        "response": parsed_data.get("response", "No content provided."),
+        **metadata
+    }
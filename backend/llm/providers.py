@@ -0,0 +1,626 @@
+import os
+import sys
+import time
+import random
+import asyncio
+from pathlib import Path
+from contextlib import asynccontextmanager, contextmanager
+
+from llm import openrouter_client
+from llm.scheduler import limiter_from_env
+from llm.latency import latency_tracker
+from llm.models import model_key
+from llm.timeouts import deadlines_for
+from llm.circuit_breaker import breaker_from_env, CIRCUIT_BREAKER_ENABLED
+from utils.logger import get_logger
+from utils import metrics, tracing
+
+# Initialize logger
+logger = get_logger("Providers")
+
+# Outcome of a call that ended without one (cancelled), for the circuit breakers
+_NO_OUTCOME = object()
+
+# The model package (Gemini and YellowCake calls) lives next to backend/
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+def _external_api():
+    """
+    Imports model.external_api on first use, so importing this module has no side effects.
+    Its URL validation, Gemini and YellowCake calls report their spans to our tracer, and the Gemini calls
+    YellowCake makes take slots from the Gemini adapter's limiter, like direct Gemini calls.
+    """
+    if str(PROJECT_ROOT) not in sys.path:
+        sys.path.append(str(PROJECT_ROOT))
+    from model import external_api
+    if external_api._span is not tracing.span:
+        external_api.set_tracer(tracing.span)
+    if external_api._gemini_admission is external_api._no_admission:
+        external_api.set_gemini_admission(adapter_for_model(GeminiAdapter.PREFIX).admission)
+    return external_api
+
+class ProviderAdapter:
+    """
+    One upstream provider: which models it serves and how it is called.
+    Each adapter owns its client (and connection pool), admission limiter, timeout and retry policy,
+    so a slow provider only uses up its own resources.
+    Settings come from <PREFIX>_TIMEOUT, <PREFIX>_CONNECT_TIMEOUT, <PREFIX>_MAX_RETRIES and <PREFIX>_RETRY_BACKOFF
+    (plus the limiter's <PREFIX>_MAX_CONCURRENCY, _MAX_QUEUE and _MAX_QUEUE_WAIT).
+    <PREFIX>_TIMEOUT is the default total deadline; see llm.timeouts for the adaptive per-model deadlines.
+    """
+    name = None
+    label = None
+    env_prefix = None
+    # Same prompt, same answer - results may be cached and identical calls coalesced
+    deterministic = False
+    # Sends "delta" events in streaming mode
+    streams_tokens = False
+    # Calls on_first_byte() when data starts arriving, so a first-byte deadline can be enforced
+    signals_first_byte = False
+    # Derive per-model deadlines from observed latencies (off where latency depends on the prompt, e.g. URL count)
+    adaptive_timeouts = True
+    # Error class (for metrics) of a result that came back with an "error" instead of raising
+    result_error_class = "invalid_response"
+
+    def __init__(self, max_concurrency, max_queue, max_wait=10.0, timeout=30.0, connect_timeout=5.0, max_retries=1, retry_backoff=0.5):
+        prefix = self.env_prefix
+        self.limiter = limiter_from_env(self.name, prefix, max_concurrency, max_queue, max_wait)
+        self.timeout = float(os.getenv(f"{prefix}_TIMEOUT", timeout))  # Default seconds per attempt
+        # None when the client doesn't expose a separate connect timeout
+        self.connect_timeout = None if connect_timeout is None else float(os.getenv(f"{prefix}_CONNECT_TIMEOUT", connect_timeout))
+        self.max_retries = int(os.getenv(f"{prefix}_MAX_RETRIES", max_retries))
+        self.retry_backoff = float(os.getenv(f"{prefix}_RETRY_BACKOFF", retry_backoff))  # Base delay, doubled per retry
+        # The provider circuit only counts failures to reach the provider; each model's circuit counts all its failures
+        self.breaker = breaker_from_env(self.name)
+        self._model_breakers = {}
+
+    def matches(self, model):
+        raise NotImplementedError
+
+    async def _call_once(self, prompt, model, on_delta, on_page, on_first_byte):
+        """
+        One upstream call. Returns a result dict; raises on transport and API errors.
+        """
+        raise NotImplementedError
+
+    def deadlines(self, model):
+        """
+        Returns the connect, first-byte and total deadlines for the next call to the model.
+        """
+        return deadlines_for(
+            model_key(model), self.connect_timeout, self.timeout, streams=self.signals_first_byte, adaptive=self.adaptive_timeouts
+        )
+
+    async def _attempt(self, prompt, model, on_delta, on_page, deadlines):
+        """
+        One attempt under the first-byte and total deadlines. Records the latencies the deadlines are derived from;
+        an attempt that runs out of time is only counted as a timeout (see LatencyTracker).
+        Raises asyncio.TimeoutError with the phase that ran out ("first_byte" or "total").
+        The result's "timings" get upstream_ms (and ttfb_ms) unless the provider measured them itself.
+        """
+        started_at = time.monotonic()
+        first_byte = asyncio.Event()
+        timings = {}
+        key = model_key(model)
+
+        def on_first_byte():
+            if not first_byte.is_set():
+                first_byte.set()
+                elapsed = time.monotonic() - started_at
+                timings["ttfb_ms"] = round(elapsed * 1000, 1)
+                latency_tracker.record(key, elapsed, kind="first_byte")
+                metrics.observe("model_first_byte_seconds", elapsed, provider=self.name, model=key)
+
+        task = asyncio.ensure_future(self._call_once(prompt, model, on_delta, on_page, on_first_byte))
+        try:
+            if deadlines.first_byte is not None and deadlines.first_byte < deadlines.total:
+                waiter = asyncio.ensure_future(first_byte.wait())
+                await asyncio.wait({task, waiter}, timeout=deadlines.first_byte, return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if not first_byte.is_set() and not task.done():
+                    latency_tracker.record_timeout(key, kind="first_byte")
+                    raise asyncio.TimeoutError("first_byte")
+
+            remaining = deadlines.total - (time.monotonic() - started_at)
+            try:
+                result = await asyncio.wait_for(asyncio.shield(task), timeout=max(0.0, remaining))
+            except asyncio.TimeoutError:
+                latency_tracker.record_timeout(key)
+                raise asyncio.TimeoutError("total")
+        finally:
+            task.cancel()
+
+        elapsed = time.monotonic() - started_at
+        if "error" not in result:
+            latency_tracker.record(key, elapsed)
+        timings["upstream_ms"] = round(elapsed * 1000, 1)
+        return {**result, "timings": {**timings, **result.get("timings", {})}}
+
+    def is_retryable(self, error):
+        """
+        True for errors worth another attempt (connection problems, rate limits, 5xx).
+        """
+        return False
+
+    def is_upstream_error(self, error):
+        """
+        True for errors the provider reported or the network caused (logged without a stack trace).
+        """
+        return False
+
+    def is_transport_error(self, error):
+        """
+        True if the provider itself could not be reached.
+        """
+        return False
+
+    def describe_error(self, error):
+        return str(error)
+
+    def model_breaker(self, model):
+        key = model_key(model)
+        if key not in self._model_breakers:
+            self._model_breakers[key] = breaker_from_env(key)
+        return self._model_breakers[key]
+
+    def check_circuit(self, model):
+        """
+        Raises CircuitOpen if the provider or the model is known to be failing.
+        """
+        if CIRCUIT_BREAKER_ENABLED:
+            self.breaker.check()
+            self.model_breaker(model).check()
+
+    def _enter_circuits(self, model):
+        """
+        Admits a call through the provider and model circuits. Returns [(breaker, is_probe), ...].
+        """
+        if not CIRCUIT_BREAKER_ENABLED:
+            return []
+        provider_probe = self.breaker.acquire()
+        try:
+            model_probe = self.model_breaker(model).acquire()
+        except Exception:
+            if provider_probe:
+                self.breaker.release()
+            raise
+        return [(self.breaker, provider_probe), (self.model_breaker(model), model_probe)]
+
+    def _exit_circuits(self, circuits, error):
+        """
+        Records the call's outcome: error is None on success, else the exception (or "timeout").
+        A call that ended without an outcome (cancelled) just gives back its probe slots.
+        """
+        for breaker, probe in circuits:
+            if error is _NO_OUTCOME:
+                if probe:
+                    breaker.release()
+            elif breaker is self.breaker:
+                breaker.record(isinstance(error, Exception) and self.is_transport_error(error), probe=probe)
+            else:
+                breaker.record(error is not None, probe=probe)
+
+    async def warm(self):
+        """
+        Opens a connection to the provider ahead of the first request (see llm.warmup).
+        """
+
+    def pool_info(self):
+        return {}
+
+    @asynccontextmanager
+    async def admission(self, on_queued=None):
+        """
+        Holds one of the provider's slots for the duration of the block.
+        """
+        with tracing.span("admission", provider=self.name):
+            await self.limiter.acquire(on_queued=on_queued)
+        try:
+            yield
+        finally:
+            self.limiter.release()
+
+    async def call(self, prompt, model, on_delta=None, on_page=None):
+        """
+        Calls the provider with the model's current deadlines (per attempt) and this adapter's retry policy.
+        A call that already streamed something to the client is never retried.
+        Returns the result dict with the timings of the last attempt, or {"model", "error"} once the attempts are used up.
+        """
+        logger.info(f"Initiating async call for model: {model} (provider: {self.name})")
+        streamed = False
+
+        def track(callback):
+            if callback is None:
+                return None
+
+            def forward(value):
+                nonlocal streamed
+                streamed = True
+                callback(value)
+            return forward
+
+        on_delta, on_page = track(on_delta), track(on_page)
+        circuits = self._enter_circuits(model)
+        outcome = _NO_OUTCOME
+        error_class = None
+        labels = {"provider": self.name, "model": model_key(model)}
+        metrics.increment("model_calls_total", **labels)
+        metrics.adjust("model_calls_in_flight", 1, provider=self.name)
+        started_at = time.monotonic()
+        try:
+            attempt = 0
+            while True:
+                deadlines = self.deadlines(model)
+                try:
+                    with tracing.span("provider.attempt", provider=self.name, model=model, attempt=attempt + 1,
+                                      first_byte_deadline=deadlines.first_byte, total_deadline=deadlines.total):
+                        result = await self._attempt(prompt, model, on_delta, on_page, deadlines)
+                    outcome = None
+                    if "error" in result:
+                        error_class = self.result_error_class
+                    return {**result, "timings": {**result["timings"], "attempts": attempt + 1}}
+                except asyncio.TimeoutError as e:
+                    outcome = "timeout"
+                    error_class = "timeout"
+                    if e.args and e.args[0] == "first_byte":
+                        logger.error(f"Request for {model} sent nothing within {deadlines.first_byte:.1f} seconds.")
+                        return {"model": model, "error": f"Model did not start responding within {deadlines.first_byte:.1f} seconds."}
+                    logger.error(f"Request for {model} timed out after {deadlines.total:.1f} seconds.")
+                    return {"model": model, "error": "Model response timed out."}
+                except Exception as e:
+                    if attempt < self.max_retries and not streamed and self.is_retryable(e):
+                        delay = random.uniform(0, self.retry_backoff * 2 ** attempt)
+                        attempt += 1
+                        metrics.increment("model_call_retries_total", **labels)
+                        logger.warning(f"Retrying {model} in {delay:.2f}s (attempt {attempt + 1}): {e}")
+                        await asyncio.sleep(delay)
+                        continue
+                    outcome = e
+                    if self.is_upstream_error(e):
+                        error_class = "upstream_error"
+                        logger.error(f"Upstream error for {model}: {type(e).__name__}: {str(e)}")
+                    else:
+                        error_class = "internal"
+                        logger.exception(f"Unexpected error for {model}: {str(e)}")
+                    return {"model": model, "error": self.describe_error(e)}
+        finally:
+            self._exit_circuits(circuits, outcome)
+            metrics.adjust("model_calls_in_flight", -1, provider=self.name)
+            if outcome is _NO_OUTCOME:
+                metrics.increment("model_calls_cancelled_upstream_total", **labels)
+            else:
+                metrics.observe("model_call_duration_seconds", time.monotonic() - started_at, **labels)
+            if error_class is not None:
+                metrics.increment("model_errors_total", error_class=error_class, **labels)
+
+    def metadata(self):
+        return {
+            "label": self.label,
+            "deterministic": self.deterministic,
+            "streams_tokens": self.streams_tokens,
+            "timeout_seconds": self.timeout,
+            "connect_timeout_seconds": self.connect_timeout,
+            "adaptive_timeouts": self.adaptive_timeouts,
+            "retry": {"max_retries": self.max_retries, "backoff_seconds": self.retry_backoff},
+            "limits": {
+                "max_concurrency": self.limiter.max_concurrency,
+                "max_queue": self.limiter.max_queue,
+                "max_wait_seconds": self.limiter.max_wait,
+            },
+            "pool": self.pool_info(),
+            "circuit": self.breaker.stats(),
+        }
+
+    def circuit_state(self, model):
+        """
+        State of the model's circuit (or the provider's, if that one is not closed).
+        """
+        provider_state = self.breaker.state
+        if provider_state != "closed":
+            return provider_state
+        breaker = self._model_breakers.get(model_key(model))
+        return breaker.state if breaker is not None else "closed"
+
+class OpenRouterAdapter(ProviderAdapter):
+    name = "openrouter"
+    label = "OpenRouter"
+    env_prefix = "OPENROUTER"
+    # Every call is sent with temperature 0
+    deterministic = True
+    streams_tokens = True
+    signals_first_byte = True
+    # Answers that aren't the JSON envelope come back as an "error" result
+    result_error_class = "invalid_json"
+
+    def matches(self, model):
+        # Anything no other adapter claims is an OpenRouter model id
+        return True
+
+    async def _client(self):
+        return await openrouter_client.get_client_async(
+            max_connections=self.limiter.max_concurrency, connect_timeout=self.connect_timeout
+        )
+
+    async def _call_once(self, prompt, model, on_delta, on_page, on_first_byte):
+        # Make sure the shared client exists with this adapter's pool settings before the call uses it
+        await self._client()
+        return await openrouter_client.ask_openrouter(prompt, model=model, on_delta=on_delta, on_first_byte=on_first_byte)
+
+    def is_retryable(self, error):
+        import openai
+        if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+    def is_upstream_error(self, error):
+        import openai
+        return isinstance(error, openai.APIError)
+
+    def is_transport_error(self, error):
+        import openai
+        return isinstance(error, openai.APIConnectionError)
+
+    async def warm(self):
+        # Listing models is free and leaves a pooled connection behind
+        client = await self._client()
+        await client.models.list()
+
+    def pool_info(self):
+        return {"max_connections": self.limiter.max_concurrency}
+
+class GeminiAdapter(ProviderAdapter):
+    name = "gemini"
+    label = "Google Gemini (Direct API)"
+    env_prefix = "GEMINI"
+    PREFIX = "google-direct/"
+
+    def matches(self, model):
+        return model.startswith(self.PREFIX)
+
+    async def _call_once(self, prompt, model, on_delta, on_page, on_first_byte):
+        # Extract the actual model name from the identifier
+        actual_model_name = model.replace(self.PREFIX, "")
+        logger.info(f"Using Gemini model: {actual_model_name}")
+
+        # Using a generic assistant base_prompt since this is a direct user query
+        gemini_response = await _external_api().call_gemini_async(
+            base_prompt="You are a helpful AI assistant. Respond to the user's query directly and naturally.",
+            user_prompt=prompt,
+            model_name=actual_model_name,
+            # The attempt's (adaptive) total deadline bounds the call; see _attempt
+            timeout=None
+        )
+        return {
+            "model": f"Google Gemini ({actual_model_name})",
+            "response": gemini_response
+        }
+
+    def is_retryable(self, error):
+        import httpx
+        from google.genai import errors
+        if isinstance(error, (errors.ServerError, httpx.TransportError)):
+            return True
+        return isinstance(error, errors.ClientError) and error.code == 429
+
+    def is_upstream_error(self, error):
+        import httpx
+        from google.genai import errors
+        return isinstance(error, (errors.APIError, httpx.HTTPError))
+
+    def is_transport_error(self, error):
+        import httpx
+        return isinstance(error, httpx.TransportError)
+
+    def describe_error(self, error):
+        return f"Google Gemini API error: {str(error)}"
+
+    async def warm(self):
+        await _external_api().warm_gemini_async()
+
+    def pool_info(self):
+        # YellowCake's URL suggestions and prompt checks use the same client (and this adapter's limiter)
+        return {"client": "google-genai", "shared_with": ["yellowcake"]}
+
+@contextmanager
+def _phase(name):
+    """
+    Times one phase of a YellowCake call into yellowcake_phase_seconds (failed phases included), as a span too.
+    """
+    started_at = time.monotonic()
+    try:
+        with tracing.span(f"yellowcake.{name}"):
+            yield
+    finally:
+        metrics.observe("yellowcake_phase_seconds", time.monotonic() - started_at, phase=name)
+
+class YellowCakeAdapter(ProviderAdapter):
+    name = "yellowcake"
+    label = "YellowCake (web extraction)"
+    env_prefix = "YELLOWCAKE"
+    # Call time grows with the number of URLs in the prompt
+    adaptive_timeouts = False
+
+    def matches(self, model):
+        return "yellowcake" in model.lower()
+
+    async def _call_once(self, prompt, model, on_delta, on_page, on_first_byte):
+        external_api = _external_api()
+
+        # Extract URLs from user input and validate them concurrently (in its own task, so its phase
+        # ends with the last check); each URL starts scraping as soon as it is confirmed
+        confirmed = asyncio.Queue()
+
+        async def validate():
+            try:
+                with _phase("url_validation"):
+                    async for url in external_api.iter_valid_urls_async(prompt):
+                        confirmed.put_nowait(url)
+            finally:
+                confirmed.put_nowait(None)
+
+        async def confirmed_urls():
+            try:
+                while (url := await confirmed.get()) is not None:
+                    yield url
+            finally:
+                # YELLOWCAKE_MAX_URLS reached (or cancelled) - the remaining checks no longer matter
+                validation.cancel()
+
+        validation = asyncio.create_task(validate())
+        try:
+            # Scrape every page on the event loop (bounded concurrency, per-page deadline)
+            with _phase("scrape"):
+                pages = await external_api.scrape_urls_async(
+                    confirmed_urls(), prompt, on_page=on_page, max_urls=external_api.YELLOWCAKE_MAX_URLS
+                )
+        finally:
+            validation.cancel()
+        if not pages:
+            logger.warning("No valid URLs found in user input for YellowCake.")
+            return {"model": model, "error": "No valid URLs found in the prompt."}
+
+        # Pages finish in any order; the response lists them as the URLs appear in the prompt
+        order = external_api.order_urls(prompt, [page["url"] for page in pages])
+        pages.sort(key=lambda page: order.index(page["url"]))
+        logger.info(f"Scraped {len(pages)} URL(s) with YellowCake: {order}")
+        for page in pages:
+            metrics.observe("yellowcake_page_seconds", page["elapsed"], outcome="error" if "error" in page else "ok")
+
+        # The card keeps one summary per page; the scraped text is merged into "response"
+        summaries = [{k: page[k] for k in ("url", "elapsed", "error") if k in page} for page in pages]
+        if not any("response" in page for page in pages):
+            return {"model": model, "error": pages[0]["error"], "pages": summaries}
+        with _phase("merge"):
+            response = external_api.merge_pages(pages)
+        return {
+            "model": model,
+            "response": response,
+            "pages": summaries
+        }
+
+    def is_retryable(self, error):
+        import httpx
+        return isinstance(error, httpx.TransportError)
+
+    def is_upstream_error(self, error):
+        import httpx
+        return isinstance(error, httpx.HTTPError)
+
+    def is_transport_error(self, error):
+        return self.is_retryable(error)
+
+    def describe_error(self, error):
+        return f"YellowCake processing error: {str(error)}"
+
+    async def warm(self):
+        await _external_api().warm_yellowcake_async()
+
+    def pool_info(self):
+        external_api = _external_api()
+        return {
+            "max_connections": external_api.HTTP_MAX_CONNECTIONS,
+            "pages_per_call": external_api.YELLOWCAKE_URL_CONCURRENCY,
+        }
+
+# Checked in order; OpenRouter comes last because it takes any model id
+ADAPTERS = [
+    # The Gemini SDK only takes a total timeout
+    GeminiAdapter(max_concurrency=8, max_queue=32, connect_timeout=None),
+    YellowCakeAdapter(max_concurrency=4, max_queue=16, max_wait=30.0, timeout=90.0, max_retries=0),
+    OpenRouterAdapter(max_concurrency=64, max_queue=256),
+]
+
+def adapter_for_model(model):
+    """
+    Returns the adapter that serves the given model identifier.
+    """
+    return next(adapter for adapter in ADAPTERS if adapter.matches(model))
+
+def provider_for_model(model):
+    """
+    Returns the name of the upstream provider that serves the given model identifier.
+    """
+    return adapter_for_model(model).name
+
+async def call_model(prompt, model, on_delta=None, on_page=None):
+    """
+    Calls the model through its provider's adapter (admission is up to the caller, see adapter.admission).
+    If on_delta is given, token-streaming providers call on_delta(text) with each new piece of the response;
+    for YellowCake, on_page(page) is called as each scraped URL finishes.
+    """
+    return await adapter_for_model(model).call(prompt, model, on_delta=on_delta, on_page=on_page)
+
+def effective_timeouts(models):
+    """
+    Returns the current deadlines of each model, with the samples they are based on and the timeouts seen.
+    """
+    timeouts = {}
+    for model in models:
+        key = model_key(model)
+        deadlines = adapter_for_model(model).deadlines(model)
+        timeouts[model] = {
+            **deadlines._asdict(),
+            "samples": latency_tracker.count(key),
+            "first_byte_samples": latency_tracker.count(key, kind="first_byte"),
+            "timeouts": latency_tracker.timeouts(key),
+            "first_byte_timeouts": latency_tracker.timeouts(key, kind="first_byte"),
+        }
+    return timeouts
+
+def _collect():
+    """
+    Provider state for /metrics, read at scrape time.
+    """
+    for adapter in ADAPTERS:
+        provider = {"provider": adapter.name}
+        stats = adapter.limiter.stats()
+        yield "provider_in_flight_calls", "gauge", provider, stats["in_flight"]
+        yield "provider_max_concurrency", "gauge", provider, stats["max_concurrency"]
+        yield "provider_queue_depth", "gauge", provider, stats["queue_depth"]
+        yield "provider_circuit_open", "gauge", provider, adapter.breaker.state != "closed"
+        for model, breaker in list(adapter._model_breakers.items()):
+            yield "model_circuit_open", "gauge", {**provider, "model": model}, breaker.state != "closed"
+    # Only once YellowCake has been used (importing the model package here would undo the lazy import)
+    if "model.external_api" in sys.modules:
+        for name, value in _external_api().speculation_stats().items():
+            yield f"yellowcake_speculation_{name}_total", "counter", {}, value
+
+metrics.register_collector(_collect)
+
+def providers_metadata():
+    return {adapter.name: adapter.metadata() for adapter in ADAPTERS}
+
+def scheduler_stats():
+    """
+    Returns the current load and queue depth of every provider.
+    """
+    return {adapter.name: adapter.limiter.stats() for adapter in ADAPTERS}
+
+def speculation_stats():
+    return _external_api().speculation_stats()
+
+def warmup_steps():
+    """
+    Startup steps that take the cold-start cost off the first request: prompt templates and
+    SDK imports, then one TLS connection per provider.
+    """
+    external_api = _external_api()
+    return {
+        "preload": lambda: asyncio.to_thread(_preload, external_api),
+        **{adapter.name: adapter.warm for adapter in ADAPTERS},
+    }
+
+def _preload(external_api):
+    """
+    Imports the provider SDKs and loads the prompt templates. Blocking - run it in a worker thread.
+    """
+    import openai  # noqa: F401
+    external_api.preload()
+
+async def close_clients():
+    """
+    Closes every provider client (on application shutdown).
+    """
+    await openrouter_client.close_client()
+    if "model.external_api" in sys.modules:
+        await _external_api().aclose_clients()
@@ -0,0 +1,98 @@
+import os
+import asyncio
+from collections import deque
+
+from utils.logger import get_logger
+from utils import metrics
+
+# Initialize logger
+logger = get_logger("Scheduler")
+
+class AdmissionRejected(Exception):
+    """Raised when a provider's wait queue is full or a queued call waited too long."""
+
+class ProviderLimiter:
+    """
+    Caps concurrent upstream calls for one provider.
+    Calls beyond the limit wait in a bounded FIFO queue; calls beyond the queue are rejected.
+    """
+
+    def __init__(self, name, max_concurrency, max_queue, max_wait):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait  # Seconds a call may sit in the queue
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters = deque()
+
+    @property
+    def queue_depth(self):
+        return len(self._waiters)
+
+    async def acquire(self, on_queued=None):
+        """
+        Waits for a free slot. Calls on_queued(position) if the call has to wait.
+        Raises AdmissionRejected when the queue is full or the wait exceeds max_wait.
+        """
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        if on_queued is not None:
+            on_queued(len(self._waiters))
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up - pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject(f"waited more than {self.max_wait:.1f}s")
+            raise
+
+    def release(self):
+        """
+        Hands the slot to the next live waiter, or frees it.
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # in_flight stays the same - the slot changes owner
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _reject(self, reason):
+        self.rejected += 1
+        metrics.increment("admission_rejected_total", provider=self.name)
+        logger.warning(f"Rejected {self.name} call: {reason} ({self.stats()})")
+        raise AdmissionRejected(f"{self.name} is at capacity ({reason}), please retry shortly.")
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "max_wait_seconds": self.max_wait,
+            "rejected_total": self.rejected,
+        }
+
+def limiter_from_env(name, prefix, default_concurrency, default_queue, default_wait=10.0):
+    # e.g. OPENROUTER_MAX_CONCURRENCY, OPENROUTER_MAX_QUEUE, OPENROUTER_MAX_QUEUE_WAIT
+    return ProviderLimiter(
+        name,
+        max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", default_concurrency)),
+        max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", default_queue)),
+        max_wait=float(os.getenv(f"{prefix}_MAX_QUEUE_WAIT", default_wait)),
+    )
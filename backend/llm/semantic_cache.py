@@ -0,0 +1,189 @@
+import os
+import re
+import time
+import zlib
+
+from utils import metrics
+
+# NumPy is imported where it is used: the semantic cache is off by default and shouldn't slow down startup
+
+# Words that rarely change what is being asked ("What is the capital of France?" ~ "capital of france")
+STOPWORDS = frozenset(
+    "a an the is are was were be what which who whom how do does did of to in on for "
+    "please tell me can could would you i about".split()
+)
+# Words, plus operators that change the question on their own ("2+2" vs "2-2", "x < y" vs "x > y")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[+\-*/%^=<>&|~]")
+# Weight of word bigrams, which carry the word order ("Is Python faster than Java?" vs "Is Java faster than Python?")
+BIGRAM_WEIGHT = 2.0
+
+def embed_prompt(text, dim=512):
+    """
+    Embeds a prompt with the hashing trick over tokens (words and operators), character trigrams and token bigrams.
+    CPU-only and dependency-free beyond NumPy; returns an L2-normalized float32 vector.
+    """
+    import numpy as np
+    tokens = [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in tokens:
+        # crc32 is stable across processes, unlike hash()
+        vector[zlib.crc32(token.encode()) % dim] += 1.0
+        padded = f"#{token}#"
+        for i in range(len(padded) - 2):
+            vector[zlib.crc32(padded[i:i + 3].encode()) % dim] += 0.5
+    for first, second in zip(tokens, tokens[1:]):
+        vector[zlib.crc32(f"{first} {second}".encode()) % dim] += BIGRAM_WEIGHT
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+# Similarity at which a new prompt counts as one already in the index (float32 rounding keeps it below 1.0)
+DUPLICATE_SIMILARITY = 0.9999
+
+class _ModelIndex:
+    """
+    Prompt vectors and cached results for one model, stored in a preallocated matrix.
+    """
+
+    def __init__(self, capacity, dim):
+        import numpy as np
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.stored_at = np.zeros(capacity, dtype=np.float64)
+        self.values = [None] * capacity
+        self.size = 0
+
+    def lru_slot(self):
+        import numpy as np
+        return int(np.argmin(self.last_used[:self.size]))
+
+    def remove(self, slot):
+        # Move the last row into the freed slot to keep rows [0, size) dense
+        last = self.size - 1
+        if slot != last:
+            self.vectors[slot] = self.vectors[last]
+            self.last_used[slot] = self.last_used[last]
+            self.stored_at[slot] = self.stored_at[last]
+            self.values[slot] = self.values[last]
+        self.values[last] = None
+        self.size -= 1
+
+class SemanticCache:
+    """
+    Per-model nearest-neighbour cache over prompt embeddings.
+    A lookup is a vectorized cosine top-1 search; it hits when the best match clears the threshold.
+    """
+
+    def __init__(self, threshold=0.92, ttl=3600.0, max_entries_per_model=1000, max_bytes=64 * 1024 * 1024, dim=512):
+        self.threshold = threshold
+        self.ttl = ttl  # Seconds
+        self.max_entries_per_model = max_entries_per_model
+        self.max_bytes = max_bytes  # Cap on vector storage across all models
+        self.dim = dim
+        self.hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+        self._indexes = {}
+
+    def _bytes_used(self):
+        return sum(index.vectors.nbytes for index in self._indexes.values())
+
+    def lookup(self, model, prompt, max_age=None):
+        """
+        Returns (value, similarity) for the closest cached prompt, or (None, best_similarity).
+        """
+        started_at = time.perf_counter()
+        value, similarity = None, 0.0
+        index = self._indexes.get(model)
+        if index is not None and index.size:
+            query = embed_prompt(prompt, self.dim)
+            scores = index.vectors[:index.size] @ query
+            slot = int(scores.argmax())
+            similarity = float(scores[slot])
+            now = time.time()
+            age = now - index.stored_at[slot]
+            if age > self.ttl:
+                index.remove(slot)
+            elif similarity >= self.threshold and (max_age is None or age <= max_age):
+                index.last_used[slot] = now
+                value = index.values[slot]
+
+        elapsed = time.perf_counter() - started_at
+        self.lookup_seconds += elapsed
+        if value is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        metrics.increment("semantic_cache_lookups_total", result="hit" if value is not None else "miss")
+        metrics.increment("semantic_cache_lookup_seconds_total", elapsed)
+        return value, similarity
+
+    def add(self, model, prompt, value):
+        """
+        Stores the result for the prompt; a prompt that is already indexed (same embedding) gets its row refreshed.
+        """
+        vector = embed_prompt(prompt, self.dim)
+        now = time.time()
+        index = self._indexes.get(model)
+        if index is not None and index.size:
+            scores = index.vectors[:index.size] @ vector
+            slot = int(scores.argmax())
+            if scores[slot] >= DUPLICATE_SIMILARITY:
+                index.last_used[slot] = now
+                index.stored_at[slot] = now
+                index.values[slot] = value
+                return
+
+        if index is None:
+            if self._bytes_used() + self.max_entries_per_model * self.dim * 4 > self.max_bytes:
+                # No room for another model's matrix - make room by dropping the least recently used model
+                self._evict_model()
+            index = self._indexes[model] = _ModelIndex(self.max_entries_per_model, self.dim)
+
+        if index.size == self.max_entries_per_model:
+            index.remove(index.lru_slot())
+            metrics.increment("semantic_cache_evictions_total")
+
+        slot = index.size
+        index.vectors[slot] = vector
+        index.last_used[slot] = now
+        index.stored_at[slot] = now
+        index.values[slot] = value
+        index.size += 1
+
+    def _evict_model(self):
+        if not self._indexes:
+            return
+        oldest = min(
+            self._indexes,
+            key=lambda m: self._indexes[m].last_used[:self._indexes[m].size].max(initial=0.0)
+        )
+        del self._indexes[oldest]
+        metrics.increment("semantic_cache_evictions_total")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "models": len(self._indexes),
+            "entries": sum(index.size for index in self._indexes.values()),
+            "bytes": self._bytes_used(),
+            "max_bytes": self.max_bytes,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "avg_lookup_ms": 1000 * self.lookup_seconds / lookups if lookups else 0.0,
+        }
+
+# Off by default: a near-duplicate prompt is not always the same question
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "0").lower() in ("1", "true", "yes")
+
+# Shared by every request in this process
+semantic_cache = SemanticCache(
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+    ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "3600")),
+    max_entries_per_model=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES_PER_MODEL", "1000")),
+    max_bytes=int(os.getenv("SEMANTIC_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
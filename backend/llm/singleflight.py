@@ -0,0 +1,85 @@
+import asyncio
+import hashlib
+
+from utils import metrics
+
+def normalize_prompt(prompt):
+    """
+    Collapses whitespace so trivially different copies of a prompt share one call.
+    """
+    return " ".join(prompt.split())
+
+def flight_key(prompt, model, system_instruction):
+    """
+    Builds the coalescing key for a (prompt, model, system instruction) call.
+    """
+    raw = "\x1f".join([model, system_instruction, normalize_prompt(prompt)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class _Flight:
+    """
+    One in-progress upstream call and everyone waiting on it.
+    """
+
+    def __init__(self):
+        self.task = None
+        self.waiters = 0
+        self.subscribers = []  # on_delta callbacks of streaming waiters
+        self.text_so_far = ""
+
+    def broadcast(self, text):
+        self.text_so_far += text
+        for on_delta in list(self.subscribers):
+            on_delta(text)
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one upstream call.
+    The first caller starts the call, later callers await the same task.
+    The call is only cancelled once every waiter has gone away.
+    """
+
+    def __init__(self):
+        self._flights = {}
+
+    def in_flight(self):
+        return len(self._flights)
+
+    async def do(self, key, factory, on_delta=None):
+        """
+        Returns (result, coalesced). factory(on_delta) starts the upstream call.
+        If the first caller streams, the deltas are fanned out to every streaming waiter.
+        """
+        flight = self._flights.get(key)
+        coalesced = flight is not None
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.create_task(factory(flight.broadcast if on_delta is not None else None))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            metrics.increment("singleflight_coalesced_total")
+
+        if on_delta is not None:
+            # Late joiners catch up with what has been streamed so far
+            if flight.text_so_far:
+                on_delta(flight.text_so_far)
+            flight.subscribers.append(on_delta)
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if on_delta is not None:
+                flight.subscribers.remove(on_delta)
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is left to read the result
+                flight.task.cancel()
+        return result, coalesced
+
+    def _forget(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+# Shared by every request in this process
+single_flight = SingleFlight()
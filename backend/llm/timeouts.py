@@ -0,0 +1,43 @@
+import os
+from typing import NamedTuple, Optional
+
+from llm.latency import latency_tracker
+
+# Adaptive deadlines: quantile of observed latency x multiplier, clamped to [min, max] (seconds)
+ADAPTIVE_TIMEOUTS_ENABLED = os.getenv("ADAPTIVE_TIMEOUTS_ENABLED", "1").lower() in ("1", "true", "yes")
+TIMEOUT_PERCENTILE = float(os.getenv("TIMEOUT_PERCENTILE", "0.99"))
+TIMEOUT_MULTIPLIER = float(os.getenv("TIMEOUT_MULTIPLIER", "2.0"))
+TIMEOUT_MIN_SAMPLES = int(os.getenv("TIMEOUT_MIN_SAMPLES", "20"))
+TIMEOUT_MIN_SECONDS = float(os.getenv("TIMEOUT_MIN_SECONDS", "5"))
+TIMEOUT_MAX_SECONDS = float(os.getenv("TIMEOUT_MAX_SECONDS", "180"))
+FIRST_BYTE_TIMEOUT_MIN_SECONDS = float(os.getenv("FIRST_BYTE_TIMEOUT_MIN_SECONDS", "2"))
+
+class Deadlines(NamedTuple):
+    connect: float  # TCP + TLS setup, per provider
+    first_byte: Optional[float]  # Until the first streamed data; None when the provider doesn't stream
+    total: float  # The whole attempt
+    source: str  # "observed" once the model has enough samples, else "default"
+
+def _adaptive(model, kind, low, high):
+    observed = latency_tracker.percentile(model, TIMEOUT_PERCENTILE, min_samples=TIMEOUT_MIN_SAMPLES, kind=kind)
+    if observed is None:
+        return None
+    return min(high, max(low, observed * TIMEOUT_MULTIPLIER))
+
+def deadlines_for(model, connect, default_total, streams=True, adaptive=True):
+    """
+    Returns the deadlines for the next call to the model.
+    Until the model has TIMEOUT_MIN_SAMPLES samples (or if adaptive is off) the provider's
+    default total applies and the first-byte deadline is the same as the total.
+    """
+    total = first_byte = None
+    if adaptive and ADAPTIVE_TIMEOUTS_ENABLED:
+        total = _adaptive(model, "total", TIMEOUT_MIN_SECONDS, TIMEOUT_MAX_SECONDS)
+        if total is not None and streams:
+            first_byte = _adaptive(model, "first_byte", FIRST_BYTE_TIMEOUT_MIN_SECONDS, total)
+
+    source = "observed" if total is not None else "default"
+    total = total if total is not None else default_total
+    if streams and first_byte is None:
+        first_byte = total
+    return Deadlines(connect=connect, first_byte=first_byte if streams else None, total=total, source=source)
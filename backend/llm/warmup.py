@@ -0,0 +1,60 @@
+import os
+import asyncio
+import time
+
+from utils.logger import get_logger
+
+# Initialize logger
+logger = get_logger("Warmup")
+
+# Warmup runs in the background at startup; each step gets this long (seconds)
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1").lower() in ("1", "true", "yes")
+WARMUP_STEP_TIMEOUT = float(os.getenv("WARMUP_STEP_TIMEOUT", "10"))
+
+class Warmup:
+    """
+    Runs the startup steps (preloading, SDK imports, TLS connections) and remembers how each went.
+    A failed step is reported but does not block readiness - that provider just starts cold.
+    """
+
+    def __init__(self):
+        self.started_at = None
+        self.finished_at = None
+        self.steps = {}  # name -> {"ok", "seconds", "error"?}
+
+    @property
+    def ready(self):
+        return self.finished_at is not None
+
+    async def _run_step(self, name, step):
+        started_at = time.monotonic()
+        try:
+            await asyncio.wait_for(step(), timeout=WARMUP_STEP_TIMEOUT)
+            outcome = {"ok": True}
+        except asyncio.TimeoutError:
+            outcome = {"ok": False, "error": f"Timed out after {WARMUP_STEP_TIMEOUT:g} seconds."}
+        except Exception as e:
+            outcome = {"ok": False, "error": str(e)}
+        outcome["seconds"] = round(time.monotonic() - started_at, 3)
+        self.steps[name] = outcome
+        if not outcome["ok"]:
+            logger.warning(f"Warmup step {name} failed: {outcome['error']}")
+
+    async def run(self, steps):
+        """
+        Runs the named steps concurrently. `steps` maps a name to a no-argument coroutine function.
+        """
+        self.started_at = time.monotonic()
+        await asyncio.gather(*(self._run_step(name, step) for name, step in steps.items()))
+        self.finished_at = time.monotonic()
+        logger.info(f"Warmup finished in {self.finished_at - self.started_at:.2f}s | Steps: {self.steps}")
+
+    def status(self):
+        if self.started_at is None:
+            elapsed = None
+        else:
+            elapsed = round((self.finished_at or time.monotonic()) - self.started_at, 3)
+        return {"ready": self.ready, "seconds": elapsed, "steps": dict(self.steps)}
+
+# One warmup per process
+warmup = Warmup()
@@ -1,19 +1,57 @@
 import asyncio
 import json
-from typing import List
-from fastapi import FastAPI
-from fastapi.responses import StreamingResponse
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import List, Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from dotenv import load_dotenv
+
+# Settings in .env must be visible before the llm modules read their configuration
+load_dotenv()
 
 # Import your refactored async client
-from llm.openrouter_client import ask_openrouter
+from llm.openrouter_client import SYSTEM_INSTRUCTION, COMPLETION_PARAMS
+from llm.providers import (
+    adapter_for_model, provider_for_model, call_model, providers_metadata, scheduler_stats, effective_timeouts,
+    speculation_stats, warmup_steps, close_clients
+)
+from llm.models import AVAILABLE_MODELS
+from llm.scheduler import AdmissionRejected
+from llm.circuit_breaker import CircuitOpen
+from llm.hedging import hedge_target, hedged_call
+from llm.latency import latency_tracker
+from llm.singleflight import single_flight, flight_key
+from llm.cache import cache_key, lookup_cached, store_cached, cache_stats
+from llm.warmup import warmup, WARMUP_ENABLED
 from utils.logger import get_logger
+from utils import metrics, tracing
+from utils.thread_pool import install_default_executor
+from utils import profiling
 
 # Initialize logger
 logger = get_logger("MainApp")
 
-app = FastAPI(title="LLM Side-by-Side Aggregator")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Starts the warmup in the background (so the server accepts connections right away; see /ready)
+    and closes the provider clients on shutdown.
+    asyncio.to_thread work runs on an instrumented pool, so its saturation shows up in /metrics.
+    """
+    install_default_executor(asyncio.get_running_loop())
+    profiling.install(asyncio.get_running_loop())
+    warmup_task = asyncio.create_task(warmup.run(warmup_steps() if WARMUP_ENABLED else {}))
+    try:
+        yield
+    finally:
+        warmup_task.cancel()
+        await close_clients()
+        tracing.shutdown()
+
+app = FastAPI(title="LLM Side-by-Side Aggregator", lifespan=lifespan)
 
 # 1. Setup CORS
 # Crucial so your React frontend (e.g., localhost:3000) can talk to this API
@@ -27,79 +65,299 @@ app.add_middleware(
 
 # 2. Define the Request Schema
 # This matches the JSON body the frontend will send
+class CacheOptions(BaseModel):
+    # Skip the cache lookup (the fresh result is still stored)
+    bypass: bool = False
+    # Only accept cached results younger than this many seconds
+    max_age: Optional[float] = None
+
 class CompareRequest(BaseModel):
     prompt: str
     models: List[str]
+    # Emit incremental "delta" events before each model's final result
+    stream: bool = False
+    cache: CacheOptions = CacheOptions()
+    # Profile this request (only honored when PROFILING_ENABLED is set); the final events carry the profile_id
+    profile: bool = False
 
-async def stream_aggregator(prompt: str, models: List[str]):
+# Only these keys of a result are worth caching; the rest describe how it was produced
+CACHED_RESULT_KEYS = ("model", "response")
+
+async def run_model(prompt: str, model: str, events: asyncio.Queue, stream: bool = False, cache: CacheOptions = None):
     """
-    The Orchestrator:
-    Fires off all LLM calls in parallel and yields JSON as they finish.
+    Runs a single model and pushes (event, is_final) pairs onto the shared queue.
+    Models whose circuit is open fail immediately with an "unavailable" event.
+    Otherwise the call first waits for a slot from its provider's admission limiter.
+    Models with a hedging policy may get a second attempt if the first is slow.
+    OpenRouter results are served from the response cache tiers when possible, and identical
+    concurrent OpenRouter calls (from any request) share one upstream call.
+    The final result is always pushed last, with the server-side "timings" of the call that produced it.
     """
-    logger.info(f"New Request | Prompt: {prompt[:50]}... | Models: {models}")
+    cache = cache or CacheOptions()
+    on_delta = on_page = None
+    if stream:
+        # Deltas are keyed by the requested model so the UI can route them before the actual model is known
+        on_delta = lambda text: events.put_nowait(({"model": model, "delta": text}, False))
+        # YellowCake reports each scraped URL as it finishes
+        on_page = lambda page: events.put_nowait(({"model": model, "page": page}, False))
+
+    def on_queued(position):
+        events.put_nowait(({"model": model, "status": "queued", "queue_position": position}, False))
+
+    async def attempt(target, attempt_on_delta, is_hedge=False):
+        adapter = adapter_for_model(target)
+        # A model known to be down fails right away instead of queueing for a slot
+        adapter.check_circuit(target)
+        queued_at = time.monotonic()
+        # Only the primary attempt reports its queue position; hedges wait silently
+        async with adapter.admission(on_queued=None if is_hedge else on_queued):
+            queue_wait_ms = round((time.monotonic() - queued_at) * 1000, 1)
+            attempt_result = await call_model(prompt, target, on_delta=attempt_on_delta, on_page=None if is_hedge else on_page)
+        return {**attempt_result, "timings": {"queue_wait_ms": queue_wait_ms, **attempt_result.get("timings", {})}}
+
+    async def hedge_attempt(target, attempt_on_delta, is_hedge):
+        # An attempt that can't get a slot just loses the race
+        try:
+            return await attempt(target, attempt_on_delta, is_hedge=is_hedge)
+        except AdmissionRejected as e:
+            return {"model": target, "status": "rejected", "error": str(e)}
+        except CircuitOpen as e:
+            return {"model": target, "status": "unavailable", "error": str(e), "retry_after": round(e.retry_after, 1)}
+
+    async def call_upstream(upstream_on_delta):
+        if hedge_target(model):
+            return await hedged_call(model, hedge_attempt, on_delta=upstream_on_delta)
+        return await attempt(model, upstream_on_delta)
+
+    # temperature=0 makes identical OpenRouter calls interchangeable
+    deterministic = adapter_for_model(model).deterministic
+    key = cache_key(model, SYSTEM_INSTRUCTION, prompt, COMPLETION_PARAMS) if deterministic else None
 
-    # Create concurrent tasks for all selected models
-    tasks = [
-        asyncio.create_task(ask_openrouter(prompt, model=m if m is not None or m != "" else "openrouter/auto")) 
-        for m in models
-    ]
+    async def call_and_store(upstream_on_delta):
+        upstream_result = await call_upstream(upstream_on_delta)
+        # A hedge sent to an alternate model answered for that model, not this one - don't cache it under this key
+        answered_by_alternate = upstream_result.get("hedge_won") and hedge_target(model) != model
+        if "error" not in upstream_result and not answered_by_alternate:
+            cached_result = {k: upstream_result[k] for k in CACHED_RESULT_KEYS if k in upstream_result}
+            await store_cached(key, model, prompt, cached_result)
+        return upstream_result
 
-    # Use as_completed to yield the FASTEST models first
-    for finished_task in asyncio.as_completed(tasks):
+    with tracing.span("model", model=model, provider=provider_for_model(model)) as model_span:
         try:
-            result = await finished_task
-            
-            # Format result as a Server-Sent Event (SSE)
-            # data: {json_string}\n\n
-            yield f"data: {json.dumps(result)}\n\n"
-            
+            cached = None
+            if deterministic and not cache.bypass:
+                lookup_started_at = time.monotonic()
+                with tracing.span("cache.lookup"):
+                    cached = await lookup_cached(key, model, prompt, max_age=cache.max_age)
+                lookup_ms = round((time.monotonic() - lookup_started_at) * 1000, 1)
+
+            if cached is not None:
+                result = {**cached, "cache_hit": True, "timings": {"cache_lookup_ms": lookup_ms}}
+            elif deterministic:
+                result, coalesced = await single_flight.do(
+                    flight_key(prompt, model, SYSTEM_INSTRUCTION), call_and_store, on_delta=on_delta
+                )
+                if coalesced:
+                    result = {**result, "coalesced": True}
+            else:
+                result = await call_upstream(on_delta)
+        except AdmissionRejected as e:
+            result = {"model": model, "status": "rejected", "error": str(e)}
+        except CircuitOpen as e:
+            metrics.increment("circuit_rejected_total", provider=provider_for_model(model))
+            result = {"model": model, "status": "unavailable", "error": str(e), "retry_after": round(e.retry_after, 1)}
         except Exception as e:
             logger.error(f"A task failed: {str(e)}")
             # We still yield an error for this specific model so the UI can handle it
-            error_msg = {"model": "unknown", "error": "Internal Server Error"}
-            yield f"data: {json.dumps(error_msg)}\n\n"
+            result = {"model": "unknown", "error": "Internal Server Error"}
+
+        if model_span is not None:
+            model_span.set(cache_hit=result.get("cache_hit", False), coalesced=result.get("coalesced", False),
+                           error=result.get("error"), status=result.get("status"))
+            # Lets the client find this call in the trace file
+            result = {**result, "trace_id": model_span.trace_id}
+
+    if "cache_hit" not in result:
+        result = {**result, "cache_hit": False}
+    if stream:
+        result = {**result, "requested_model": model, "done": True}
+    events.put_nowait((result, True))
+
+# How often to check whether the /compare client is still connected (seconds)
+DISCONNECT_POLL_INTERVAL = 0.5
+
+async def watch_disconnect(request: Request, disconnected: asyncio.Event):
+    """
+    Polls the client connection and sets `disconnected` once it goes away.
+    """
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+    disconnected.set()
+
+def cancel_outstanding(tasks: list, started_at: float):
+    """
+    Cancels every (model, task) pair that has not finished yet and reports the upstream capacity saved.
+    """
+    cancelled_by_provider = {}
+    for model, task in tasks:
+        if task.done():
+            continue
+        task.cancel()
+        provider = provider_for_model(model)
+        cancelled_by_provider[provider] = cancelled_by_provider.get(provider, 0) + 1
+        metrics.increment("model_calls_cancelled_total", provider=provider)
+
+    if cancelled_by_provider:
+        elapsed = time.monotonic() - started_at
+        logger.info(
+            f"Client disconnected after {elapsed:.1f}s | Cancelled {sum(cancelled_by_provider.values())} "
+            f"of {len(tasks)} model calls | By provider: {cancelled_by_provider}"
+        )
+
+async def stream_aggregator(prompt: str, models: List[str], stream: bool = False, request: Request = None, cache: CacheOptions = None, profile: bool = False):
+    """
+    The Orchestrator:
+    Fires off all LLM calls in parallel and yields JSON as they finish.
+    In streaming mode, each model also yields "delta" events as its tokens arrive.
+    Every event carries "elapsed_ms", the server-side time since the request arrived.
+    The whole request is one trace (see utils.tracing) when tracing is enabled.
+    With profile=True its server-side work is sampled (see utils.profiling) and the final events carry the profile_id.
+    If the client disconnects, every outstanding model call is cancelled.
+    """
+    logger.info(f"New Request | Prompt: {prompt[:50]}... | Models: {models} | Stream: {stream}")
+    started_at = time.monotonic()
+    metrics.increment("compare_requests_total", stream=str(stream).lower())
+    metrics.adjust("compare_requests_in_flight", 1)
+
+    profiler = profiling.profile_request() if profile else nullcontext()
+    # Root span of the request's trace; every model task below inherits it (and the request's profile, if any)
+    with tracing.span("compare", models=list(models), stream=stream, prompt_chars=len(prompt)), profiler as request_profile:
+        # Every model pushes its events here, so the FASTEST events are yielded first
+        events = asyncio.Queue()
+
+        # Create concurrent tasks for all selected models
+        tasks = [
+            (m or "openrouter/auto", asyncio.create_task(run_model(prompt, m or "openrouter/auto", events, stream=stream, cache=cache)))
+            for m in models
+        ]
+
+        disconnected = asyncio.Event()
+        watcher = asyncio.create_task(watch_disconnect(request, disconnected)) if request is not None else None
+        disconnect_wait = asyncio.create_task(disconnected.wait())
+
+        try:
+            remaining = len(tasks)
+            while remaining:
+                next_event = asyncio.create_task(events.get())
+                await asyncio.wait({next_event, disconnect_wait}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_event.done():
+                    # Client went away - stop waiting, the finally block cancels the rest
+                    next_event.cancel()
+                    break
+
+                event, is_final = next_event.result()
+                if is_final:
+                    remaining -= 1
+                    if request_profile is not None:
+                        event = {**event, "profile_id": request_profile.id}
+                # Server-side time since the request arrived, free of network jitter
+                event = {**event, "elapsed_ms": round((time.monotonic() - started_at) * 1000, 1)}
+
+                # Format event as a Server-Sent Event (SSE)
+                # data: {json_string}\n\n
+                yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            # Runs on normal completion, on disconnect, and when Starlette cancels the response
+            cancel_outstanding(tasks, started_at)
+            disconnect_wait.cancel()
+            if watcher is not None:
+                watcher.cancel()
+            metrics.adjust("compare_requests_in_flight", -1)
+            metrics.observe("compare_request_duration_seconds", time.monotonic() - started_at)
 
 # 3. The Endpoint
 @app.post("/compare")
-async def compare_endpoint(request_data: CompareRequest):
+async def compare_endpoint(request_data: CompareRequest, request: Request):
     """
     Receives prompt and models list. 
     Returns a Stream that stays open until all models finish.
+    Closing the connection cancels any model calls that are still running.
     """
+    profile = profiling.requested(request_data.profile, request.headers)
     return StreamingResponse(
-        stream_aggregator(request_data.prompt, request_data.models),
+        stream_aggregator(
+            request_data.prompt, request_data.models, stream=request_data.stream, request=request,
+            cache=request_data.cache, profile=profile
+        ),
         media_type="text/event-stream"
     )
 
+# Admission control visibility, for tuning the per-provider limits
+@app.get("/scheduler")
+def get_scheduler_stats():
+    """
+    Returns in-flight calls, queue depth and rejections per provider.
+    """
+    return {"providers": scheduler_stats()}
+
+# Response cache visibility (hit rates, sizes, semantic lookup latency)
+@app.get("/cache")
+def get_cache_stats():
+    """
+    Returns statistics for the memory, disk and semantic response caches.
+    """
+    return cache_stats()
+
+# Readiness probe - route traffic here only once the warmup is done
+@app.get("/ready")
+def get_readiness():
+    """
+    Returns 200 once startup warmup has finished (503 before), with the outcome of each step.
+    """
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+# Prometheus scrape target
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Returns counters, gauges and latency histograms (by provider and model) in the Prometheus text format.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Speculative YellowCake visibility (wasted streams vs latency saved)
+@app.get("/speculation")
+def get_speculation_stats():
+    """
+    Returns counters for speculative YellowCake streams.
+    """
+    return speculation_stats()
+
 # 4. An Endpoint to List Available Models
 @app.get("/models")
 def list_models():
     """
-    Returns a list of available models from OpenRouter.
-    """
-    return {"models": [
-        {"label": "GPT 4o", "value": "openai/gpt-4o"},
-        {"label": "GPT 4o Mini", "value": "openai/gpt-4o-mini"},
-        {"label": "O1 Preview", "value": "openai/o1-preview"},
-        {"label": "GPT 4 Turbo", "value": "openai/gpt-4-turbo"},
-        {"label": "Claude 3.5 Sonnet", "value": "anthropic/claude-3.5-sonnet"},
-        {"label": "Claude 3 Opus", "value": "anthropic/claude-3-opus"},
-        {"label": "Claude 3 Haiku", "value": "anthropic/claude-3-haiku"},
-        {"label": "Gemini Pro 1.5", "value": "google/gemini-pro-1.5"},
-        {"label": "Gemini Flash 1.5", "value": "google/gemini-flash-1.5"},
-        {"label": "LLaMA 3.1 405B Instruct", "value": "meta-llama/llama-3.1-405b-instruct"},
-        {"label": "LLaMA 3.1 70B Instruct", "value": "meta-llama/llama-3.1-70b-instruct"},
-        {"label": "LLaMA 3.1 8B Instruct", "value": "meta-llama/llama-3.1-8b-instruct"},
-        {"label": "Mistral Large 2407", "value": "mistralai/mistral-large-2407"},
-        {"label": "DeepSeek Chat", "value": "deepseek/deepseek-chat"},
-        {"label": "DeepSeek Coder", "value": "deepseek/deepseek-coder"},
-        {"label": "Mistral 7B Instruct (Free)", "value": "mistralai/mistral-7b-instruct:free"},
-        {"label": "Phi 3 Mini 128k Instruct (Free)", "value": "microsoft/phi-3-mini-128k-instruct:free"},
-        {"label": "OpenRouter Auto", "value": "openrouter/auto"},
-        {"label": "Google Gemini 2.0 Flash (Free - Direct API)", "value": "google-direct/gemini-2.0-flash-exp"},
-        {"label": "Google Gemini 1.5 Flash (Free - Direct API)", "value": "google-direct/gemini-1.5-flash"},
-        {"label": "YellowCake API (For Automation)", "value": "YellowCake"}  # Placeholder for custom models
-    ]}
+    Returns a list of available models, each tagged with the provider that serves it and its circuit state,
+    plus the settings of every provider adapter.
+    """
+    return {
+        "models": [
+            {**m, "provider": provider_for_model(m["value"]), "circuit": adapter_for_model(m["value"]).circuit_state(m["value"])}
+            for m in AVAILABLE_MODELS
+        ],
+        "providers": providers_metadata()
+    }
+
+# Current per-model deadlines (derived from observed latencies once there are enough samples)
+@app.get("/timeouts")
+def get_timeouts():
+    """
+    Returns the connect, first-byte and total deadlines the next call to each model would get.
+    Covers the listed models plus "other" (all unlisted model ids) once one has been called.
+    """
+    models = [m["value"] for m in AVAILABLE_MODELS]
+    models += [m for m in latency_tracker.models() if m not in models]
+    return {"models": effective_timeouts(models)}
 
 if __name__ == "__main__":
     import uvicorn
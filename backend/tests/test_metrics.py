@@ -0,0 +1,48 @@
+import sys
+import threading
+from pathlib import Path
+
+# The backend modules import each other by package name when run from the backend directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import metrics
+
+def _histogram(text, name):
+    values = {}
+    for line in text.splitlines():
+        if line.startswith((f"{name}_sum", f"{name}_count")):
+            metric, value = line.split(" ")
+            values[metric.split("{")[0]] = float(value)
+    return values
+
+def test_scrape_sees_whole_histogram_updates():
+    name = "test_consistency_seconds"
+    stop = threading.Event()
+
+    def record():
+        while not stop.is_set():
+            metrics.observe(name, 1.0)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        for _ in range(200):
+            values = _histogram(metrics.render(), name)
+            # Every observation is 1.0, so the sum always equals the count unless an update was torn
+            if values:
+                assert values[f"{name}_sum"] == values[f"{name}_count"]
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+def test_shards_are_added_up():
+    name = "test_shards_total"
+    threads = [threading.Thread(target=metrics.increment, args=(name,), kwargs={"value": 2}) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert f"{name} 6" in metrics.render().splitlines()
@@ -0,0 +1,45 @@
+import sys
+import json
+import time
+from pathlib import Path
+
+# The backend modules import each other by package name when run from the backend directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.parser import PartialResponseDecoder
+
+def _feed(raw, size):
+    decoder = PartialResponseDecoder()
+    deltas = [decoder.feed(raw[i:i + size]) for i in range(0, len(raw), size)]
+    return decoder, deltas
+
+def test_small_chunks_add_up_to_the_response():
+    text = 'Line one\nTab\there, "quoted", back\\slash, café, emoji \U0001F600 and é again. ' * 20
+    raw = json.dumps({"response": text})
+    for size in (1, 2, 3, 5, 7):
+        decoder, deltas = _feed(raw, size)
+        assert "".join(deltas) == text
+        assert decoder.text == text
+
+def test_surrogate_pairs_are_not_split():
+    raw = json.dumps({"response": "a \U0001F600 b"})  # ASCII-escaped: 😀
+    _, deltas = _feed(raw, 1)
+    assert all(not ("\ud800" <= delta[-1:] <= "\udbff") for delta in deltas if delta)
+    assert "".join(deltas) == "a \U0001F600 b"
+
+def test_text_after_the_closing_quote_is_ignored():
+    decoder = PartialResponseDecoder()
+    assert decoder.feed('{"resp') == ""
+    assert decoder.feed('onse": "hi') == "hi"
+    assert decoder.feed('!", "other": "x"}') == "!"
+    assert decoder.feed(' trailing') == ""
+
+def test_each_chunk_is_decoded_once():
+    raw = json.dumps({"response": "word " * 4000})  # ~20 KB
+    started_at = time.perf_counter()
+    _, deltas = _feed(raw, 4)
+    elapsed = time.perf_counter() - started_at
+
+    assert "".join(deltas) == "word " * 4000
+    # Rescanning the whole buffer per chunk took seconds here; one pass takes milliseconds
+    assert elapsed < 0.5
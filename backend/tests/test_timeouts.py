@@ -0,0 +1,65 @@
+import sys
+import asyncio
+from pathlib import Path
+
+import pytest
+
+# The backend modules import each other by package name when run from the backend directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from llm import providers, timeouts
+from llm.latency import LatencyTracker
+from llm.providers import adapter_for_model
+
+MODEL = "openai/gpt-4o"
+
+@pytest.fixture
+def tracker(monkeypatch):
+    tracker = LatencyTracker()
+    monkeypatch.setattr(providers, "latency_tracker", tracker)
+    monkeypatch.setattr(timeouts, "latency_tracker", tracker)
+    return tracker
+
+def test_timeouts_are_not_samples(tracker):
+    for _ in range(50):
+        tracker.record(MODEL, 1.0)
+    tracker.record_timeout(MODEL)
+
+    assert tracker.count(MODEL) == 50
+    assert tracker.timeouts(MODEL) == 1
+    assert tracker.percentile(MODEL, 0.99) == 1.0
+
+def test_hanging_calls_do_not_ratchet_the_deadline(tracker, monkeypatch):
+    # Scaled down: a ~10 ms model where every 50th call hangs
+    monkeypatch.setattr(timeouts, "TIMEOUT_MIN_SAMPLES", 20)
+    monkeypatch.setattr(timeouts, "TIMEOUT_MIN_SECONDS", 0.001)
+    monkeypatch.setattr(timeouts, "TIMEOUT_MAX_SECONDS", 1.0)
+    adapter = adapter_for_model(MODEL)
+    calls = 0
+
+    async def call_once(prompt, model, on_delta, on_page, on_first_byte):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(3600 if calls % 50 == 0 else 0.01)
+        return {"model": model, "response": "ok"}
+
+    monkeypatch.setattr(adapter, "_call_once", call_once)
+    monkeypatch.setattr(adapter, "signals_first_byte", False)
+
+    async def run():
+        totals = []
+        for _ in range(200):
+            deadlines = adapter.deadlines(MODEL)
+            totals.append(deadlines.total)
+            try:
+                await adapter._attempt("hi", MODEL, None, None, deadlines)
+            except asyncio.TimeoutError:
+                pass
+        return totals
+
+    totals = asyncio.run(run())
+    observed = totals[timeouts.TIMEOUT_MIN_SAMPLES + 1:]
+
+    assert tracker.timeouts(MODEL) == 4
+    # Twice the ~10 ms p99 plus scheduling noise; never the 1 s clamp a ratchet would reach
+    assert max(observed) < 0.1
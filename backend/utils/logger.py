@@ -1,11 +1,168 @@
+import os
+import json
+import time
+import queue
+import atexit
+import random
 import logging
+import logging.handlers
+
+from utils import metrics
+from utils.tracing import current_trace_id
+
+# "sync" writes each record to stderr from the calling thread; "queue" hands it to a background listener thread
+LOG_MODE = os.getenv("LOG_MODE", "sync").lower()
+# "text" or "json" (one JSON object per line)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json" if LOG_MODE == "queue" else "text").lower()
+# Records waiting for the listener; once full, new records are dropped (and counted) rather than blocking
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Share of INFO/DEBUG records kept per logger, e.g. "Providers=0.1,OpenRouterClient=0.5" (warnings are never sampled)
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+# WARNING and above: at most LOG_RATE_LIMIT records per call site every LOG_RATE_LIMIT_WINDOW seconds (0 = no limit)
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", "0"))
+LOG_RATE_LIMIT_WINDOW = float(os.getenv("LOG_RATE_LIMIT_WINDOW", "60"))
+
+TEXT_FORMAT = '[%(asctime)s] %(levelname)s - %(name)s: %(message)s'
+
+def _parse_rates(spec):
+    rates = {}
+    for item in spec.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a share of each logger's INFO/DEBUG records (per LOG_SAMPLE_RATES); warnings and errors always pass.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        rate = self.rates.get(record.name)
+        if rate is None or record.levelno >= logging.WARNING or random.random() < rate:
+            return True
+        metrics.increment("log_records_dropped_total", reason="sampled", logger=record.name)
+        return False
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most `limit` WARNING+ records per call site (file and line) per window.
+    The first record after a window with drops carries the number suppressed in `suppressed`.
+    Called from any thread without a lock: a race only miscounts by a record or two.
+    """
+
+    def __init__(self, limit, window):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._sites = {}  # (pathname, lineno) -> [window start, passed, suppressed]
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            return True
+        now = time.monotonic()
+        site = self._sites.get((record.pathname, record.lineno))
+        if site is None or now - site[0] >= self.window:
+            suppressed = site[2] if site is not None else 0
+            self._sites[(record.pathname, record.lineno)] = [now, 1, 0]
+            if suppressed:
+                record.suppressed = suppressed
+            return True
+        if site[1] < self.limit:
+            site[1] += 1
+            return True
+        site[2] += 1
+        metrics.increment("log_records_dropped_total", reason="rate_limited", logger=record.name)
+        return False
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: ts, level, logger, message, thread, plus exc (traceback), trace_id and suppressed when set.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        # Queued records captured their trace id in the caller; sync records are formatted in the caller
+        trace_id = record.trace_id if hasattr(record, "trace_id") else current_trace_id()
+        if trace_id is not None:
+            entry["trace_id"] = trace_id
+        if getattr(record, "suppressed", None):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records without blocking: when the queue is full the record is dropped and counted.
+    The traceback is formatted by the listener thread, not the caller (the stdlib QueueHandler does it up front).
+    """
+
+    def prepare(self, record):
+        # Resolved here, in the caller's context; the listener thread has none
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.trace_id = current_trace_id()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.increment("log_records_dropped_total", reason="queue_full", logger=record.name)
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # The queue may be full at shutdown - wait for the listener to make room instead of failing
+        self.queue.put(self._sentinel, timeout=5.0)
+
+def _formatter():
+    return JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+
+def _add_filters(handler):
+    if LOG_SAMPLE_RATES:
+        handler.addFilter(SamplingFilter(_parse_rates(LOG_SAMPLE_RATES)))
+    if LOG_RATE_LIMIT > 0:
+        handler.addFilter(RateLimitFilter(LOG_RATE_LIMIT, LOG_RATE_LIMIT_WINDOW))
+    return handler
+
+# Queue mode: one queue and listener thread for every logger, started with the first one
+_queue_handler = None
+_listener = None
+
+def _shared_queue_handler():
+    global _queue_handler, _listener
+    if _queue_handler is None:
+        records = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        output = logging.StreamHandler()
+        output.setFormatter(_formatter())
+        _listener = _Listener(records, output)
+        _listener.start()
+        # Flush what is still queued when the process exits
+        atexit.register(_listener.stop)
+        metrics.register_collector(lambda: [("log_queue_depth", "gauge", {}, records.qsize())])
+        _queue_handler = _add_filters(DroppingQueueHandler(records))
+    return _queue_handler
 
 def get_logger(name=__name__):
     logger = logging.getLogger(name)
     if not logger.hasHandlers():
         logger.setLevel(logging.INFO)
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter('[%(asctime)s] %(levelname)s - %(name)s: %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-    return logger
\ No newline at end of file
+        if LOG_MODE == "queue":
+            logger.addHandler(_shared_queue_handler())
+        else:
+            handler = logging.StreamHandler()
+            handler.setFormatter(_formatter())
+            logger.addHandler(_add_filters(handler))
+    return logger
@@ -0,0 +1,146 @@
+import math
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+# Latency buckets (seconds) for histograms that don't pass their own
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Every thread records into its own shard, so recording never contends with another thread's recording;
+# readers sum the shards. Each shard's lock makes one update (e.g. a histogram's bucket and sum) and a
+# scrape's copy of the shard atomic to each other; only a scrape can ever have to wait for it.
+# Keys are (name, sorted label pairs).
+_shards = []
+_local = threading.local()
+
+# Prometheus type of each metric name ("counter", "gauge" or "histogram")
+_types = {}
+_buckets = {}
+
+# Callables that report values computed at scrape time (pool sizes, queue depths, ...)
+_collectors = []
+
+class _Shard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = Counter()  # Counters and gauges
+        self.histograms = {}  # key -> [count per bucket..., +Inf count, sum]
+
+def _shard():
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = _Shard()
+        # list.append is atomic, so registering a new thread needs no lock
+        _shards.append(shard)
+    return shard
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def increment(name, value=1, **labels):
+    """
+    Adds value to the counter identified by name and labels.
+    """
+    _types.setdefault(name, "counter")
+    shard = _shard()
+    with shard.lock:
+        shard.values[_key(name, labels)] += value
+
+def adjust(name, delta, **labels):
+    """
+    Moves the gauge identified by name and labels up or down by delta (e.g. +1 / -1 around in-flight work).
+    """
+    _types.setdefault(name, "gauge")
+    shard = _shard()
+    with shard.lock:
+        shard.values[_key(name, labels)] += delta
+
+def observe(name, value, buckets=None, **labels):
+    """
+    Records one observation (usually seconds) in the histogram identified by name and labels.
+    """
+    if name not in _types:
+        _types[name] = "histogram"
+        _buckets[name] = tuple(buckets or DEFAULT_BUCKETS)
+    bounds = _buckets[name]
+    key = _key(name, labels)
+    bucket = bisect_left(bounds, value)
+    shard = _shard()
+    with shard.lock:
+        counts = shard.histograms.get(key)
+        if counts is None:
+            counts = shard.histograms[key] = [0] * (len(bounds) + 2)
+        counts[bucket] += 1
+        counts[-1] += value
+
+def register_collector(collect):
+    """
+    Adds a callable that returns [(name, type, labels, value), ...] when /metrics is scraped.
+    """
+    _collectors.append(collect)
+
+def _merged_values():
+    merged = Counter()
+    for shard in list(_shards):
+        with shard.lock:
+            values = list(shard.values.items())
+        for key, value in values:
+            merged[key] += value
+    return merged
+
+def _merged_histograms():
+    merged = {}
+    for shard in list(_shards):
+        with shard.lock:
+            histograms = [(key, list(counts)) for key, counts in shard.histograms.items()]
+        for key, counts in histograms:
+            total = merged.setdefault(key, [0] * len(counts))
+            for i, count in enumerate(counts):
+                total[i] += count
+    return merged
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _number(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+def render():
+    """
+    Returns every metric in the Prometheus text exposition format (version 0.0.4).
+    """
+    samples = {}  # name -> (type, [line, ...])
+
+    def add(name, kind, line):
+        samples.setdefault(name, (kind, []))[1].append(line)
+
+    for (name, labels), value in sorted(_merged_values().items()):
+        add(name, _types.get(name, "counter"), f"{name}{_labels(labels)} {_number(value)}")
+
+    for (name, labels), counts in sorted(_merged_histograms().items()):
+        cumulative = 0
+        for bound, count in zip(_buckets[name] + (math.inf,), counts[:-1]):
+            cumulative += count
+            add(name, "histogram", f"{name}_bucket{_labels(labels + (('le', _number(float(bound))),))} {cumulative}")
+        add(name, "histogram", f"{name}_sum{_labels(labels)} {_number(float(counts[-1]))}")
+        add(name, "histogram", f"{name}_count{_labels(labels)} {cumulative}")
+
+    for collect in list(_collectors):
+        for name, kind, labels, value in collect():
+            if value is not None:
+                add(name, kind, f"{name}{_labels(tuple(sorted(labels.items())))} {_number(value)}")
+
+    lines = []
+    for name, (kind, metric_lines) in samples.items():
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(metric_lines)
+    return "\n".join(lines) + "\n"
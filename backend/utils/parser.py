@@ -21,4 +21,74 @@ def parse_llm_json(raw_content):
         return {
             "error": "Invalid JSON format",
             "raw_payload": raw_content
-        }
\ No newline at end of file
+        }
+
+# Matches the opening of the "response" value in the {"response": "..."} envelope
+RESPONSE_FIELD_PATTERN = re.compile(r'"response"\s*:\s*"')
+# How far back a search for the opening resumes, so an opening split across chunks is still found
+RESPONSE_FIELD_OVERLAP = 32
+# The characters that end a run of plain text in a JSON string
+STRING_SPECIAL_PATTERN = re.compile(r'[\\"]')
+# A \uXXXX escape for the first half of a surrogate pair
+HIGH_SURROGATE_ESCAPE_PATTERN = re.compile(r'\\u[dD][89abAB][0-9a-fA-F]{2}')
+
+class PartialResponseDecoder:
+    """
+    Decodes the text of the "response" field from a JSON envelope while it is being streamed.
+    feed(content) takes the next chunk and returns only the text it completes ("" if none), so each chunk
+    is scanned and decoded once however long the response gets.
+    Incomplete escape sequences (and the first half of a surrogate pair) are held back until the next chunk.
+    """
+
+    def __init__(self):
+        self.text = ""  # Everything decoded so far
+        self._raw = ""  # Received but not decoded yet
+        self._started = False
+        self._finished = False
+
+    def feed(self, content):
+        if self._finished or not content:
+            return ""
+        self._raw += content
+        if not self._started:
+            match = RESPONSE_FIELD_PATTERN.search(self._raw)
+            if not match:
+                # Only the tail can still be the start of the opening
+                self._raw = self._raw[-RESPONSE_FIELD_OVERLAP:]
+                return ""
+            self._started = True
+            self._raw = self._raw[match.end():]
+
+        # Walk the string value until the closing quote (or the end of what we have so far)
+        raw = self._raw
+        end = 0
+        while True:
+            special = STRING_SPECIAL_PATTERN.search(raw, end)
+            if special is None:
+                end = len(raw)
+                break
+            i = special.start()
+            if raw[i] == '"':
+                end = i
+                self._finished = True
+                break
+            # \uXXXX needs 6 characters, every other escape needs 2;
+            # a high surrogate is decoded together with the escape after it (its low half)
+            escape_length = 6 if raw[i + 1:i + 2] == 'u' else 2
+            if escape_length == 6 and HIGH_SURROGATE_ESCAPE_PATTERN.match(raw, i):
+                escape_length = 12 if raw[i + 6:i + 8] == '\\u' or len(raw) < i + 8 else 6
+            if i + escape_length > len(raw):
+                end = i
+                break
+            end = i + escape_length
+
+        segment, self._raw = raw[:end], raw[end:]
+        if not segment:
+            return ""
+        try:
+            piece = json.loads(f'"{segment}"', strict=False)
+        except json.JSONDecodeError:
+            # Broken escapes - show the raw slice instead of nothing
+            piece = segment
+        self.text += piece
+        return piece
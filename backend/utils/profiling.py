@@ -0,0 +1,152 @@
+import os
+import sys
+import time
+import asyncio
+import secrets
+import threading
+import contextvars
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+
+from utils.logger import get_logger
+
+# Initialize logger
+logger = get_logger("Profiling")
+
+# Per-request profiling is off unless enabled; then a request opts in with "profile": true
+# or with the PROFILE_HEADER header (unset = header not accepted)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0").lower() in ("1", "true", "yes")
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+
+# The profile of the request the current task or worker thread is working for
+_active = contextvars.ContextVar("active_profile", default=None)
+
+class RequestProfile:
+    """
+    Sampling profiler for one request. Every PROFILE_INTERVAL a background thread takes the stack of
+    - the event loop thread, but only while one of the request's tasks is running a step, and
+    - every worker thread while it runs work submitted on the request's behalf (see tagged_thread).
+    Other requests sharing the loop and the pools stay out of the profile.
+    The stacks are saved in the "folded" format (one "frame;frame;... count" line per stack),
+    which flamegraph.pl and speedscope read.
+    """
+
+    def __init__(self):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(4)}"
+        self.path = os.path.join(PROFILE_DIR, f"{self.id}.folded")
+        self.tasks = weakref.WeakSet()
+        self.threads = {}  # Worker thread ident -> thread name
+        self.stacks = Counter()
+        self.samples = 0
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._started_at = time.monotonic()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name=f"profiler-{self.id}", daemon=True)
+
+    def _record(self, label, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        stack.append(label)
+        self.stacks[";".join(reversed(stack))] += 1
+
+    def _sample(self):
+        frames = sys._current_frames()
+        self.samples += 1
+        task = asyncio.current_task(self._loop)
+        if task is not None and task in self.tasks:
+            self._record("event-loop", frames.get(self._loop_thread))
+        for ident, name in list(self.threads.items()):
+            if ident in frames:
+                self._record(name, frames[ident])
+
+    def _run(self):
+        while not self._stop.wait(PROFILE_INTERVAL):
+            self._sample()
+        # Written here, so finishing the request never waits on the disk
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as file:
+                for stack, count in self.stacks.most_common():
+                    file.write(f"{stack} {count}\n")
+            logger.info(
+                f"Profile {self.id} saved to {self.path} | {sum(self.stacks.values())} stacks "
+                f"from {self.samples} samples over {time.monotonic() - self._started_at:.2f}s"
+            )
+        except OSError as e:
+            logger.error(f"Could not save profile {self.id}: {e}")
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+
+@contextmanager
+def profile_request():
+    """
+    Profiles the work of the current task and of every task and to_thread call it starts.
+    Yields the RequestProfile; the profile is saved in the background once the block exits.
+    """
+    profile = RequestProfile()
+    current = asyncio.current_task()
+    if current is not None:
+        profile.tasks.add(current)
+    token = _active.set(profile)
+    profile.start()
+    try:
+        yield profile
+    finally:
+        profile.stop()
+        try:
+            _active.reset(token)
+        except ValueError:
+            # Closed from another context (e.g. an abandoned generator being finalized)
+            pass
+
+def task_factory(loop, coro, context=None, **kwargs):
+    """
+    Event loop task factory that tags tasks created on behalf of a profiled request (see profile_request).
+    """
+    task = asyncio.Task(coro, loop=loop, context=context, **kwargs)
+    profile = context.get(_active) if context is not None else _active.get()
+    if profile is not None:
+        profile.tasks.add(task)
+    return task
+
+@contextmanager
+def tagged_thread():
+    """
+    Marks the current worker thread as working for the active request's profile, if there is one.
+    """
+    profile = _active.get()
+    if profile is None:
+        yield
+        return
+    ident = threading.get_ident()
+    profile.threads[ident] = threading.current_thread().name
+    try:
+        yield
+    finally:
+        profile.threads.pop(ident, None)
+
+def requested(flag, headers):
+    """
+    True if profiling is enabled and the request asked for it, with its flag or the PROFILE_HEADER header.
+    """
+    if not PROFILING_ENABLED:
+        return False
+    return bool(flag) or (bool(PROFILE_HEADER) and headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes"))
+
+def install(loop):
+    """
+    Lets profiled requests tag their tasks (on application startup; only when profiling is enabled).
+    """
+    if PROFILING_ENABLED:
+        loop.set_task_factory(task_factory)
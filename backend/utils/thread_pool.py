@@ -0,0 +1,58 @@
+import os
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import metrics
+from utils.profiling import tagged_thread
+
+# Worker threads for asyncio.to_thread / run_in_executor(None, ...) (Python's default when unset)
+THREAD_POOL_MAX_WORKERS = int(os.getenv("THREAD_POOL_MAX_WORKERS", "0")) or None
+
+_pools = []
+
+class InstrumentedThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor that reports its saturation: queued and busy tasks (gauges),
+    time spent waiting for a free worker (histogram), plus its size at scrape time.
+    Tasks run in a copy of the submitter's context, so run_in_executor work stays in the caller's trace
+    (asyncio.to_thread already does this) and shows up in the caller's request profile.
+    """
+
+    def __init__(self, max_workers=None, thread_name_prefix=""):
+        super().__init__(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self.pool_name = thread_name_prefix or "default"
+        _pools.append(self)
+
+    def submit(self, fn, /, *args, **kwargs):
+        pool = self.pool_name
+        context = contextvars.copy_context()
+        submitted_at = time.monotonic()
+        metrics.adjust("thread_pool_queued_tasks", 1, pool=pool)
+
+        def run():
+            metrics.adjust("thread_pool_queued_tasks", -1, pool=pool)
+            metrics.observe("thread_pool_queue_wait_seconds", time.monotonic() - submitted_at, pool=pool)
+            metrics.adjust("thread_pool_busy_threads", 1, pool=pool)
+            try:
+                return context.run(_run_tagged, fn, args, kwargs)
+            finally:
+                metrics.adjust("thread_pool_busy_threads", -1, pool=pool)
+        return super().submit(run)
+
+def _run_tagged(fn, args, kwargs):
+    with tagged_thread():
+        return fn(*args, **kwargs)
+
+def _collect():
+    for pool in list(_pools):
+        yield "thread_pool_max_workers", "gauge", {"pool": pool.pool_name}, pool._max_workers
+        yield "thread_pool_threads", "gauge", {"pool": pool.pool_name}, len(pool._threads)
+
+metrics.register_collector(_collect)
+
+def install_default_executor(loop):
+    """
+    Makes an instrumented pool the loop's default executor, which asyncio.to_thread uses.
+    """
+    loop.set_default_executor(InstrumentedThreadPoolExecutor(max_workers=THREAD_POOL_MAX_WORKERS, thread_name_prefix="to_thread"))
@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import queue
+import random
+import asyncio
+import secrets
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Off by default; spans are appended to TRACE_FILE as JSON lines (one span per line)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "0").lower() in ("1", "true", "yes")
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+# Share of /compare requests that get traced (decided once per trace, at the root span)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+
+class Span:
+    """
+    One timed operation. Field names follow OpenTelemetry, so the file can be turned into OTLP offline.
+    """
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes", "start_ns", "thread", "status")
+
+    def __init__(self, name, parent, attributes):
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.thread = threading.current_thread().name
+        self.status = "ok"
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self, end_ns):
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": end_ns,
+            "durationMs": round((end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "thread": self.thread,
+            "attributes": self.attributes,
+        }
+
+class JsonlExporter:
+    """
+    Writes finished spans from a background thread, so ending a span never touches the disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, record):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+        self._queue.put(record)
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as file:
+            while True:
+                record = self._queue.get()
+                # Write everything that is already queued before flushing
+                while record is not None:
+                    file.write(json.dumps(record, default=str) + "\n")
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                file.flush()
+                if record is None:
+                    return
+
+    def close(self, timeout=5.0):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+_exporter = JsonlExporter(TRACE_FILE)
+
+# The innermost open span of the current task (asyncio tasks and to_thread workers inherit it)
+_current = contextvars.ContextVar("current_span", default=None)
+# Marks a trace that was sampled out, so its child spans are skipped too
+_NOT_SAMPLED = object()
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Times the block as a child of the current span (or as a new trace). Yields the Span, or None when not traced.
+    Exceptions mark the span "error" (or "cancelled") and are re-raised.
+    """
+    parent = _current.get()
+    if not TRACING_ENABLED or parent is _NOT_SAMPLED:
+        yield None
+        return
+
+    current = _NOT_SAMPLED
+    if parent is not None or random.random() < TRACE_SAMPLE_RATE:
+        current = Span(name, parent, attributes)
+    token = _current.set(current)
+    try:
+        yield current if current is not _NOT_SAMPLED else None
+    except (asyncio.CancelledError, GeneratorExit):
+        if current is not _NOT_SAMPLED:
+            current.status = "cancelled"
+        raise
+    except BaseException as e:
+        if current is not _NOT_SAMPLED:
+            current.status = "error"
+            current.attributes["error.type"] = type(e).__name__
+        raise
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Closed from another context (e.g. an abandoned generator being finalized)
+            pass
+        if current is not _NOT_SAMPLED:
+            _exporter.export(current.to_dict(time.time_ns()))
+
+def current_trace_id():
+    """
+    Returns the id of the trace the caller is in, or None when it isn't traced.
+    """
+    current = _current.get()
+    return current.trace_id if isinstance(current, Span) else None
+
+def shutdown():
+    """
+    Writes out the spans still queued (on application shutdown).
+    """
+    _exporter.close()
@@ -89,7 +89,8 @@ export default function ModelOutputArea({
                             </div>
                           )}
                           <div className="mt-2 w-full">
-                              {modelResponse?.isLoading ? (
+                              {/* Streamed text replaces the spinner as soon as the first tokens arrive */}
+                              {modelResponse?.isLoading && !modelResponse.response ? (
                                 <div className="w-full p-2 border border-gray-300 rounded flex items-center justify-center" style={{minHeight: "240px"}}>
                                   <CircularProgress />
                                 </div>
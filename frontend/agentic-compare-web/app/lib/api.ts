@@ -5,7 +5,7 @@ export interface Model {
   label: string;
 }
 
-// Simple token counting function (approximation)
+// Simple token counting function (approximation), used when the provider reports no usage
 // Uses word count / 0.75 as a rough estimate (1 token ~= 0.75 words)
 function estimateTokenCount(text: string): number {
   if (!text) return 0;
@@ -52,18 +52,16 @@ export async function getAvailableModels(): Promise<Model[]> {
 export async function getPromptResults(
   prompt: string, 
   models: Model[],
-  onModelResponse: (modelValue: string, response: string, isError: boolean, actualModelName?: string, tokenCount?: number) => void
+  onModelResponse: (modelValue: string, response: string, isError: boolean, actualModelName?: string, tokenCount?: number, responseTime?: number) => void,
+  onModelDelta?: (modelValue: string, text: string) => void
 ): Promise<void> {
   // Get backend URL from environment variable
   const backendUrl = process.env.NEXT_PUBLIC_BACKEND_URL;
   
   // Extract model values for the API call
-  const modelValues = models.map(m => m.value);
-  
-  // Track which models we sent (for mapping responses back)
-  const sentModels = new Set(modelValues);
-  const autoModelCount = modelValues.filter(m => m === 'openrouter/auto' || m.includes('auto')).length;
-  let autoResponsesReceived = 0;
+  // Identical calls share one upstream call on the server anyway, so each model is requested once
+  // (several "openrouter/auto" cards get the same answer) and streams its tokens once
+  const modelValues = Array.from(new Set(models.map(m => m.value)));
   
   try {
     // Call the real backend API with streaming
@@ -75,6 +73,8 @@ export async function getPromptResults(
       body: JSON.stringify({
         prompt,
         models: modelValues,
+        // Ask for "delta" events so the cards fill in as the tokens arrive
+        stream: true,
       }),
     });
 
@@ -91,7 +91,6 @@ export async function getPromptResults(
     }
 
     let buffer = '';
-    const processedMessages = new Map<string, number>(); // Track how many times each message was processed
 
     while (true) {
       const { done, value } = await reader.read();
@@ -106,80 +105,44 @@ export async function getPromptResults(
       // Process complete SSE messages (format: "data: {json}\n\n")
       const lines = buffer.split('\n\n');
       
-      console.log('Buffer split into', lines.length, 'parts');
-      
       // Keep the last incomplete message in the buffer
       buffer = lines.pop() || '';
 
       // Process each complete message
       for (const line of lines) {
-        console.log('Processing line:', line.substring(0, 50) + '...');
-        if (line.startsWith('data: ')) {
-          // Parse to check if this is an auto response (model not in our sent list)
-          try {
-            const parsed = JSON.parse(line.slice(6));
-            const isAutoResponse = parsed.model && !sentModels.has(parsed.model);
-            
-            // For auto responses, allow as many as we need (ignore duplicates)
-            // For regular responses, skip duplicates
-            if (!isAutoResponse) {
-              const seenCount = processedMessages.get(line) || 0;
-              if (seenCount > 0) {
-                console.log('Skipping duplicate non-auto message');
-                continue;
-              }
-              processedMessages.set(line, 1);
-            } else {
-              // Auto response - check if we've received enough
-              if (autoResponsesReceived >= autoModelCount) {
-                console.log('Skipping excess auto response (already received:', autoResponsesReceived, ')');
-                continue;
-              }
-            }
-          } catch (e) {
-            // If parse fails, skip duplicate detection
-            if (processedMessages.has(line)) {
-              console.log('Skipping duplicate message');
-              continue;
-            }
-            processedMessages.set(line, 1);
+        if (!line.startsWith('data: ')) {
+          continue;
+        }
+        try {
+          const jsonData = line.slice(6); // Remove "data: " prefix
+          const parsed = JSON.parse(jsonData);
+
+          // Incremental text - "model" is the model we requested, so it maps straight to its card
+          if (typeof parsed.delta === 'string') {
+            onModelDelta?.(parsed.model, parsed.delta);
+            continue;
           }
           
-          try {
-            const jsonData = line.slice(6); // Remove "data: " prefix
-            const parsed = JSON.parse(jsonData);
-            
-            console.log('SSE parsed:', { model: parsed.model, hasError: !!parsed.error, hasResponse: !!parsed.response });
-            
-            // The API returns the actual model that responded
-            const returnedModelName = parsed.model;
-            
-            // Determine which of our sent models this response corresponds to
-            let originalModelValue = returnedModelName;
-            
-            // If the returned model is not one we sent exactly, it must be from an auto selection
-            if (!sentModels.has(returnedModelName)) {
-              // This response is from an auto selection
-              if (autoResponsesReceived < autoModelCount) {
-                originalModelValue = 'openrouter/auto';
-                autoResponsesReceived++;
-                console.log('Mapped to auto, counter now:', autoResponsesReceived);
-              }
-            }
-            
-            // Call the callback with the original model value we sent, plus the actual model name
-            if (parsed.error) {
-              console.log('Calling callback for error');
-              const tokenCount = estimateTokenCount(parsed.error);
-              onModelResponse(originalModelValue, parsed.error, true, returnedModelName, tokenCount);
-            } else if (parsed.response) {
-              console.log('Calling callback for response');
-              const tokenCount = estimateTokenCount(parsed.response);
-              onModelResponse(originalModelValue, parsed.response, false, returnedModelName, tokenCount);
-            }
-          } catch (parseError) {
-            console.error('Failed to parse SSE message:', line, parseError);
+          // The API returns the actual model that responded (e.g. the one OpenRouter Auto picked),
+          // and in streaming mode the model we requested in "requested_model"
+          const returnedModelName = parsed.model;
+          const originalModelValue = parsed.requested_model ?? returnedModelName;
+          
+          // Prefer the server's measurements: provider-reported tokens and time since the request arrived
+          const serverTokens: number | undefined = parsed.usage?.completion_tokens;
+          const serverTime: number | undefined = parsed.elapsed_ms;
+
+          // Call the callback with the original model value we sent, plus the actual model name
+          // (queue and per-page progress events carry neither a response nor an error)
+          if (parsed.error) {
+            const tokenCount = serverTokens ?? estimateTokenCount(parsed.error);
+            onModelResponse(originalModelValue, parsed.error, true, returnedModelName, tokenCount, serverTime);
+          } else if (parsed.response) {
+            const tokenCount = serverTokens ?? estimateTokenCount(parsed.response);
+            onModelResponse(originalModelValue, parsed.response, false, returnedModelName, tokenCount, serverTime);
           }
+        } catch (parseError) {
+          console.error('Failed to parse SSE message:', line, parseError);
         }
       }
     }
@@ -189,8 +152,8 @@ export async function getPromptResults(
     // Notify all models of the error
     const errorMessage = 'Failed to connect to the API';
     const tokenCount = estimateTokenCount(errorMessage);
-    models.forEach(model => {
-      onModelResponse(model.value, errorMessage, true, undefined, tokenCount);
+    modelValues.forEach(modelValue => {
+      onModelResponse(modelValue, errorMessage, true, undefined, tokenCount);
     });
   }
 }
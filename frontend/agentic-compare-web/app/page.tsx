@@ -25,7 +25,6 @@ export default function Home() {
   const [selectedModels, setSelectedModels] = useState<string[]>([]);
   const [prompt, setPrompt] = useState("");
   const [modelResponses, setModelResponses] = useState<Record<number, ModelResponse>>({});
-  const assignedAutoSlotsRef = useRef(new Set<number>()); // Track which auto slots have been assigned
   const [warningShown, setWarningShown] = useState(null as null | string);
   const requestStartTimeRef = useRef<number>(0); // Track when the request started
 
@@ -152,61 +151,48 @@ export default function Home() {
     
     console.log('Auto slots:', autoSlots);
     console.log('Models to send:', modelsToSend.map((m, i) => `${i}: ${m.value}`));
-    
-    // Track which auto slots have been assigned
-    assignedAutoSlotsRef.current.clear();
+
+    // Every auto card shows the one "openrouter/auto" answer; other models map to their own cards
+    const slotsFor = (modelValue: string) =>
+      modelValue === "openrouter/auto" || modelValue.includes("auto") ? autoSlots : (slotToModelMap[modelValue] || []);
 
     // Call the API
     await getPromptResults(
       prompt,
       modelsToSend,
-      (modelValue, response, isError, actualModelName, tokenCount) => {
+      (modelValue, response, isError, actualModelName, tokenCount, serverTime) => {
         console.log('Callback received:', { modelValue, actualModelName, isError, responseLength: response?.length, tokenCount });
         
-        // Calculate elapsed time
-        const responseTime = Date.now() - requestStartTimeRef.current;
+        // Use the server-measured time when available, otherwise calculate elapsed time
+        const responseTime = serverTime !== undefined ? Math.round(serverTime) : Date.now() - requestStartTimeRef.current;
         
         setModelResponses(prev => {
           const updated = { ...prev };
-          
-          // Special handling for auto: assign to the next sequential auto slot
-          if (modelValue === "openrouter/auto" || modelValue.includes("auto")) {
-            // Find the next unassigned auto slot (handles React Strict Mode double-invocation)
-            const unassignedSlot = autoSlots.find(slotIdx => !assignedAutoSlotsRef.current.has(slotIdx));
-            
-            if (unassignedSlot === undefined) {
-              return updated; // Don't process this duplicate response
-            }
-            
-            // Mark this slot as assigned
-            assignedAutoSlotsRef.current.add(unassignedSlot);
-            console.log('Assigning auto response to slot:', unassignedSlot, 'assigned count:', assignedAutoSlotsRef.current.size);
-            
-            updated[unassignedSlot] = {
+          // The final result replaces whatever was streamed so far
+          slotsFor(modelValue).forEach(slotIndex => {
+            updated[slotIndex] = {
               response,
               isError,
               isLoading: false,
-              modelValue: "openrouter/auto",
+              modelValue: prev[slotIndex]?.modelValue ?? modelValue,
               actualModelName,
               responseTime,
               tokenCount,
             };
-          } else {
-            // For non-auto models, update all slots using this model
-            const slotsToUpdate = slotToModelMap[modelValue] || [];
-            slotsToUpdate.forEach(slotIndex => {
-              updated[slotIndex] = {
-                response,
-                isError,
-                isLoading: false,
-                modelValue,
-                actualModelName,
-                responseTime,
-                tokenCount,
-              };
-            });
-          }
-          
+          });
+          return updated;
+        });
+      },
+      (modelValue, text) => {
+        // Show the tokens as they arrive; the card stays "loading" until the final result
+        setModelResponses(prev => {
+          const updated = { ...prev };
+          slotsFor(modelValue).forEach(slotIndex => {
+            const current = prev[slotIndex];
+            if (current?.isLoading) {
+              updated[slotIndex] = { ...current, response: current.response + text };
+            }
+          });
           return updated;
         });
       }
@@ -0,0 +1,140 @@
+"""
+Benchmark: YellowCake stream parsing, old chunk-based parser vs the incremental SSE parser.
+
+Replays recorded YellowCake streams (recordings/*.sse, or files passed on the command line)
+split into chunks the way the network might deliver them, and reports for each parser:
+* time per stream
+* how many replays produced the wrong result or crashed
+
+Usage (from the project root):
+    python model/benchmarks/bench_yellowcake_sse.py [--repeat N] [recording.sse ...]
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent.parent))
+
+from model.sse import SSEParser
+from model.external_api import YellowCakeCollector
+
+def legacy_parse(chunks):
+    """
+    The chunk loop call_yellowcake used before the incremental parser, kept verbatim as the baseline.
+    It assumes every chunk is exactly one whole event.
+    """
+    result = ""
+    other_event_chunks: list[str] = []
+    for chunk in chunks:
+        STATUS_STRING = "event: complete"
+        if chunk and str(chunk).strip().startswith(STATUS_STRING):
+            # Remove unnecessary parts like status strings
+            result = str(chunk).replace(STATUS_STRING, "").replace("data: ", "").strip()
+            # Convert result to Dict
+            result_dict = json.loads(result)
+            # Check if the response is successful
+            if result_dict.get("success") == True and result_dict.get("sessionId") is not None:
+                result = result_dict.get("data", "")
+                # Parse and combine all dictionaries in the list
+                if isinstance(result, list):
+                    combined_result = []
+                    for item in result:
+                        if isinstance(item, dict):
+                            for key, value in item.items():
+                                combined_result.append(f"{key}: {value}")
+                    result = "\n".join(combined_result)
+                else:
+                    result = str(result)
+        else:
+            # Remove unnecessary parts like status strings
+            status_regex = r"event: \w+"
+            result = re.sub(status_regex, "", str(chunk)).replace("data: ", "").strip('\n').strip()
+            try:
+                # Convert result to Dict
+                result_dict = json.loads(result)
+                if result_dict.get("data"):
+                    other_event_chunks.append(result_dict.get("data"))
+                elif result_dict.get("message"):
+                    other_event_chunks.append(result_dict.get("message"))
+                else:
+                    other_event_chunks.append("")
+            except json.JSONDecodeError:
+                other_event_chunks.append(str(result))
+
+    return result.strip() if result else other_event_chunks[-1].strip()
+
+def incremental_parse(chunks):
+    parser = SSEParser()
+    collector = YellowCakeCollector()
+    for chunk in chunks:
+        if any(collector.add(event) for event in parser.feed(chunk)):
+            return collector.text()
+    for event in parser.close():
+        collector.add(event)
+    return collector.text()
+
+def split_by_event(stream):
+    # What the legacy parser assumes: one chunk per event
+    return [part + "\n\n" for part in stream.split("\n\n") if part]
+
+def split_fixed(stream, size=512):
+    return [stream[i:i + size] for i in range(0, len(stream), size)]
+
+def split_random(stream, rng):
+    chunks, i = [], 0
+    while i < len(stream):
+        size = rng.randint(1, 2048)
+        chunks.append(stream[i:i + size])
+        i += size
+    return chunks
+
+def run_parser(parse, chunkings, expected, repeat):
+    failures = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for chunks in chunkings:
+            try:
+                if parse(chunks) != expected:
+                    failures += 1
+            except Exception:
+                failures += 1
+    elapsed = time.perf_counter() - started
+    runs = repeat * len(chunkings)
+    return 1e6 * elapsed / runs, failures // repeat
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("recordings", nargs="*", type=Path)
+    arg_parser.add_argument("--repeat", type=int, default=200)
+    args = arg_parser.parse_args()
+
+    recordings = args.recordings or sorted((BENCH_DIR / "recordings").glob("*.sse"))
+    rng = random.Random(42)
+
+    print(f"{'recording':<24} {'chunking':<10} {'legacy us':>10} {'legacy bad':>11} {'incr us':>9} {'incr bad':>9}")
+    for path in recordings:
+        stream = path.read_text()
+        # The reference result is the incremental parser on the whole stream in one piece
+        expected = incremental_parse([stream])
+
+        chunkings = {
+            "by-event": [split_by_event(stream)],
+            "crlf": [split_by_event(stream.replace("\n", "\r\n"))],
+            "512B": [split_fixed(stream)],
+            "random": [split_random(stream, rng) for _ in range(20)],
+        }
+        for name, variants in chunkings.items():
+            legacy_us, legacy_bad = run_parser(legacy_parse, variants, expected, args.repeat)
+            incremental_us, incremental_bad = run_parser(incremental_parse, variants, expected, args.repeat)
+            print(
+                f"{path.name:<24} {name:<10} {legacy_us:>10.1f} {f'{legacy_bad}/{len(variants)}':>11} "
+                f"{incremental_us:>9.1f} {f'{incremental_bad}/{len(variants)}':>9}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,84 @@
-from pathlib import Path
-CURR_DIR = Path(__file__).parent
+import os
+import threading
+import contextlib
+import functools
+import inspect
 
-def get_valid_urls(text: str) -> list[str]:
+# One long-lived Gemini client (and its connection pools) for the whole process
+_gemini_client = None
+_gemini_client_lock = threading.Lock()
+
+def _no_span(name, **attributes):
+    return contextlib.nullcontext()
+
+# Span factory for tracing, installed by the backend with set_tracer (nothing is traced by default)
+_span = _no_span
+
+def set_tracer(span_factory):
+    """
+    Installs span_factory(name, **attributes) -> context manager; the functions marked @_traced run inside its spans.
+    """
+    global _span
+    _span = span_factory
+
+@contextlib.asynccontextmanager
+async def _no_admission():
+    yield
+
+# Admission for the Gemini calls YellowCake makes (URL suggestions, prompt checks), installed by the backend
+# with set_gemini_admission so they share the Gemini provider's concurrency limit (unlimited by default)
+_gemini_admission = _no_admission
+
+def set_gemini_admission(admission):
+    """
+    Installs admission() -> async context manager that holds one Gemini slot for the duration of a call.
     """
-    Parses URLs from text and validates them via HTTP requests.
+    global _gemini_admission
+    _gemini_admission = admission
+
+def _traced(name, *attribute_args):
+    """
+    Runs the decorated function (sync or async) in a span named name, recording the listed arguments as attributes.
+    """
+    def decorate(fn):
+        signature = inspect.signature(fn)
+
+        def attributes(args, kwargs):
+            bound = signature.bind_partial(*args, **kwargs)
+            bound.apply_defaults()
+            return {arg: bound.arguments[arg] for arg in attribute_args if arg in bound.arguments}
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                if _span is _no_span:
+                    return await fn(*args, **kwargs)
+                with _span(name, **attributes(args, kwargs)):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if _span is _no_span:
+                    return fn(*args, **kwargs)
+                with _span(name, **attributes(args, kwargs)):
+                    return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# URL validation limits (seconds / counts)
+URL_VALIDATION_TIMEOUT = float(os.getenv("URL_VALIDATION_TIMEOUT", "5"))  # Per HEAD request
+URL_VALIDATION_DEADLINE = float(os.getenv("URL_VALIDATION_DEADLINE", "10"))  # For the whole batch
+URL_VALIDATION_PER_HOST = int(os.getenv("URL_VALIDATION_PER_HOST", "2"))  # Concurrent checks per host
+# When to ask Gemini for URL suggestions: "overlap", "fallback", "always" or "never" (see iter_valid_urls_async)
+GEMINI_URL_POLICY = os.getenv("GEMINI_URL_POLICY", "overlap")
+# How many confirmed URLs are "enough" to stop waiting for Gemini under the "overlap" policy
+URL_VALIDATION_ENOUGH = int(os.getenv("URL_VALIDATION_ENOUGH", "1"))
+
+def _extract_urls(text: str) -> list[str]:
+    """
+    Finds URLs in free text with a regex.
     """
     import re
-    import os
-    import requests
     # Regex breakdown:
     # 1. Look for http:// or https:// (optional)
     # 2. Look for www. (optional)
@@ -15,151 +86,565 @@ def get_valid_urls(text: str) -> list[str]:
     # 4. Match a dot followed by 2-6 alphabet characters (TLD)
     # 5. Match optional path/query parameters
     url_pattern = r'https?://(?:www\.)?[\w\-\.]+\.[a-z]{2,6}\S*'
-    
-    # Initial extraction
-    raw_urls = re.findall(url_pattern, text, re.IGNORECASE)
-
-    # Ask Gemini to further parse URLs from prompt
-    global CURR_DIR
-    base_prompt = ""
-    if not os.listdir(CURR_DIR).__contains__("PROMPT_GEMINI_URL_PARSING.txt"):
-        CURR_DIR = Path(__file__).parent.parent / "model" # assuming from 'backend' dir
-    with open(CURR_DIR / "PROMPT_GEMINI_URL_PARSING.txt", "r") as f:
-        base_prompt = f.read()
+    return re.findall(url_pattern, text, re.IGNORECASE)
+
+def _sibling(name: str):
+    """
+    Imports the named module of the model directory, both as part of the model package (from the backend)
+    and when external_api.py is run directly from the model directory.
+    """
+    import importlib
+    return importlib.import_module(f"{__package__}.{name}" if __package__ else name)
+
+def _resources():
+    return _sibling("resources").load_resources()
+
+def _url_parsing_prompt() -> str:
+    return _resources().url_parsing_prompt
+
+def _parse_gemini_urls(gemini_response: str) -> list[str]:
+    if not gemini_response:
+        return []
+    return [url.strip() for url in gemini_response.split(',')]
+
+def _url_candidates(*url_lists) -> list[str]:
+    """
+    Merges candidate lists in order, cleaning trailing punctuation and dropping duplicates.
+    """
+    candidates = []
+    for urls in url_lists:
+        for url in urls:
+            # Clean up trailing punctuation often caught by regex in sentences
+            url = url.rstrip('.,!?;:')
+            if url and url not in candidates:
+                candidates.append(url)
+    return candidates
+
+def _url_cache():
+    return _sibling("url_cache").url_validation_cache
+
+def _conditional_headers(stale) -> dict:
+    # Revalidate an expired valid entry cheaply if the server gave us validators last time
+    headers = {}
+    if stale is not None and stale.etag:
+        headers["If-None-Match"] = stale.etag
+    if stale is not None and stale.last_modified:
+        headers["If-Modified-Since"] = stale.last_modified
+    return headers
+
+def _record_response(url: str, status: int, final_url: str, headers, stale) -> bool:
+    """
+    Caches the outcome of a completed HEAD request and returns whether the URL is valid.
+    """
+    import time
+    URLCheck = _sibling("url_cache").URLCheck
+
+    # If the status code is under 400 (304 Not Modified included), we consider it "valid"
+    valid = status < 400
+    _url_cache().put(URLCheck(
+        url,
+        "valid" if valid else "invalid",
+        status=status,
+        final_url=str(final_url),
+        etag=headers.get("ETag") or (stale.etag if stale else None),
+        last_modified=headers.get("Last-Modified") or (stale.last_modified if stale else None),
+        checked_at=time.time(),
+    ))
+    return valid
+
+def _record_failure(url: str, timed_out: bool, host_failed: bool) -> bool:
+    """
+    Caches a failed HEAD request (always invalid) and returns False.
+    """
+    import time
+    URLCheck = _sibling("url_cache").URLCheck
+    _url_cache().put(URLCheck(url, "timeout" if timed_out else "invalid", checked_at=time.time()), host_failed=host_failed)
+    return False
+
+def _host_of(url: str) -> str:
+    from urllib.parse import urlsplit
     try:
-        gemini_response = call_gemini(base_prompt, text)
-    except Exception:
-        gemini_response = ""
-    gemini_urls = set()
-    if gemini_response:
-        gemini_urls = set([url.strip() for url in gemini_response.split(',')])
-    
-
-    # Find Valid URLs from the above candidates
-    valid_urls = set()
-
-    for url in raw_urls + list(gemini_urls):
-        # Clean up trailing punctuation often caught by regex in sentences
-        url = url.rstrip('.,!?;:')
-        
+        return urlsplit(url).hostname or url
+    except ValueError:
+        # Malformed (e.g. an unclosed IPv6 bracket); the check will find it invalid
+        return url
+
+@_traced("url.check", "url")
+async def _check_url_async(client, url: str, host_limit) -> bool:
+    import httpx
+    cached = _url_cache().get(url)
+    if cached is not None:
+        return cached.valid
+
+    stale = _url_cache().stale(url)
+    async with host_limit:
         try:
-            # We use a timeout and head request to keep it fast
-            # allow_redirects=True ensures we find the final destination
-            response = requests.head(url, timeout=5, allow_redirects=True)
-            
-            # If the status code is under 400, we consider it "valid"
-            if response.status_code < 400:
-                valid_urls.add(url)
-        except requests.RequestException:
-            # Disregard any URL that causes a connection error or timeout
-            continue
-            
-    return valid_urls # Return unique valid URLs
+            # HEAD with redirects followed, so we find the final destination
+            response = await client.head(
+                url, follow_redirects=True, timeout=URL_VALIDATION_TIMEOUT, headers=_conditional_headers(stale)
+            )
+            return _record_response(url, response.status_code, response.url, response.headers, stale)
+        # Connection errors, timeouts and malformed URLs are all invalid
+        except httpx.TimeoutException:
+            return _record_failure(url, timed_out=True, host_failed=True)
+        except httpx.TransportError:
+            return _record_failure(url, timed_out=False, host_failed=True)
+        except (httpx.HTTPError, httpx.InvalidURL, ValueError):
+            return _record_failure(url, timed_out=False, host_failed=False)
 
-# Call Gemini - for suggesting URL(s) prior to prompt OR for checking whether user prompt is going to access YellowCake correctly
-def call_gemini(base_prompt: str, user_prompt: str, model_name: str = "gemini-2.0-flash"):
-    from google import genai
-    from dotenv import load_dotenv
-    load_dotenv()
+async def iter_valid_urls_async(text: str, deadline: float = None, enough: int = None, gemini_policy: str = None):
+    """
+    Async generator yielding valid URLs from the text as soon as each check finishes.
+    The regex candidates are HEAD-checked right away while Gemini suggests more in parallel;
+    its suggestions are checked as soon as they arrive. All checks run concurrently
+    (at most URL_VALIDATION_PER_HOST per host) and anything still running when the deadline
+    (counted from the start) passes is cancelled.
+
+    gemini_policy decides when Gemini is asked (see GEMINI_URL_POLICY):
+    * "overlap"  - ask right away, cancel the call once `enough` valid URLs are confirmed
+    * "fallback" - ask only if none of the regex URLs turn out to be valid
+    * "always"   - ask right away and always wait for the suggestions
+    * "never"    - regex candidates only
+    """
+    import asyncio
+    loop = asyncio.get_running_loop()
+    give_up_at = loop.time() + (URL_VALIDATION_DEADLINE if deadline is None else deadline)
+    enough = URL_VALIDATION_ENOUGH if enough is None else enough
+    gemini_policy = gemini_policy or GEMINI_URL_POLICY
+
+    client = get_async_http_client()
+    host_limits = {}
+    seen = []
+
+    async def check(url):
+        try:
+            return url, await _check_url_async(client, url, host_limits[_host_of(url)])
+        except Exception:
+            # Whatever one bad candidate raises, it is just invalid - the other checks carry on
+            return url, False
+
+    def start_checks(urls):
+        tasks = set()
+        for url in _url_candidates(urls):
+            if url in seen:
+                continue
+            seen.append(url)
+            host_limits.setdefault(_host_of(url), asyncio.Semaphore(URL_VALIDATION_PER_HOST))
+            tasks.add(asyncio.create_task(check(url)))
+        return tasks
+
+    async def suggest():
+        try:
+            async with _gemini_admission():
+                response = await call_gemini_async(_url_parsing_prompt(), text, timeout=max(0.1, give_up_at - loop.time()))
+            return _parse_gemini_urls(response)
+        except Exception:
+            return []
+
+    pending = start_checks(_extract_urls(text))
+    gemini_task = None
+    if gemini_policy in ("overlap", "always"):
+        gemini_task = asyncio.create_task(suggest())
+        pending.add(gemini_task)
+
+    found = 0
+    try:
+        while pending:
+            remaining = give_up_at - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is gemini_task:
+                    pending |= start_checks(task.result())
+                    continue
+                url, valid = task.result()
+                if valid:
+                    found += 1
+                    yield url
+
+            if gemini_task is not None and not gemini_task.done() and gemini_policy == "overlap" and enough and found >= enough:
+                # Enough URLs confirmed - the LLM round-trip is no longer on the critical path
+                gemini_task.cancel()
+                pending.discard(gemini_task)
+            if gemini_task is None and gemini_policy == "fallback" and not pending and not found:
+                gemini_task = asyncio.create_task(suggest())
+                pending.add(gemini_task)
+    finally:
+        for task in pending:
+            task.cancel()
+
+@_traced("get_valid_urls", "enough", "gemini_policy")
+async def get_valid_urls_async(text: str, deadline: float = None, enough: int = None, gemini_policy: str = None) -> list[str]:
+    """
+    Returns every valid URL in the text, in the order the checks finished.
+    """
+    return [url async for url in iter_valid_urls_async(text, deadline=deadline, enough=enough, gemini_policy=gemini_policy)]
+
+def get_gemini_client():
+    """
+    Returns the shared Gemini client, creating it (and loading credentials) on first use.
+    Calls go through its async interface, `client.aio`.
+    """
+    global _gemini_client
+    if _gemini_client is None:
+        with _gemini_client_lock:
+            if _gemini_client is None:
+                from google import genai
+                from dotenv import load_dotenv
+                load_dotenv()
+
+                # The client gets the API key from the environment variable `GEMINI_API_KEY`.
+                _gemini_client = genai.Client()
+    return _gemini_client
 
-    # The client gets the API key from the environment variable `GEMINI_API_KEY`.
-    client = genai.Client()
+async def get_gemini_client_async():
+    """
+    get_gemini_client for the event loop: importing the SDK and building the client happen in a worker thread,
+    so the first call (or the warmup) doesn't stall other requests.
+    """
+    import asyncio
+    if _gemini_client is not None:
+        return _gemini_client
+    return await asyncio.to_thread(get_gemini_client)
 
-    response = client.models.generate_content(
-        model=model_name, contents=f"{base_prompt}\nUser Prompt: {user_prompt}"
+# Call Gemini - for suggesting URL(s) prior to prompt OR for checking whether user prompt is going to access YellowCake correctly
+# Runs on the event loop, so it can be cancelled and needs no worker thread (timeout=None: the caller enforces one)
+@_traced("gemini.generate", "model_name")
+async def call_gemini_async(base_prompt: str, user_prompt: str, model_name: str = "gemini-2.0-flash", timeout: float = 30.0):
+    import asyncio
+    client = await get_gemini_client_async()
+
+    response = await asyncio.wait_for(
+        client.aio.models.generate_content(
+            model=model_name, contents=f"{base_prompt}\nUser Prompt: {user_prompt}"
+        ),
+        timeout=timeout
     )
     return response.text
 
 
-# Call YellowCake - for automating/scraping info from specified URL(s)
-def call_yellowcake(url: str, user_prompt: str):
-    from dotenv import load_dotenv
-    import requests
+def _yellowcake_request(url: str, user_prompt: str):
+    """
+    Builds the YellowCake endpoint, headers and payload for a scraping request.
+    """
     import os
-    load_dotenv()
+    yellowcake_api_key = os.getenv("YELLOWCAKE_APIKEY")
+    if not yellowcake_api_key:
+        raise ValueError("YellowCake API key not found in environment variables.")
 
-    GEMINI_VALIDATION_PROMPT = ""
-    with open(CURR_DIR / "PROMPT_GEMINI_VERIFY_PROMPT.txt", "r") as f:
-        GEMINI_VALIDATION_PROMPT = f.read()
+    headers = {
+        "Content-Type": "application/json",
+        "X-API-Key": yellowcake_api_key
+    }
+    payload = {
+        "url": url,
+        "prompt": user_prompt
+    }
+    return _resources().yellowcake_url, headers, payload
+
+class YellowCakeCollector:
+    """
+    Turns YellowCake stream events into the final result text.
+    Only the "complete" event is JSON-decoded as it arrives; progress events are kept raw,
+    and just the last one is decoded as a fallback if the stream never completes.
+    """
+
+    def __init__(self):
+        self.result = None
+        self._last_other = None
+
+    def add(self, event) -> bool:
+        """
+        Records one SSE event. Returns True once the "complete" event has been seen.
+        """
+        import json
+        if event.event != "complete":
+            self._last_other = event.data
+            return False
+
+        # Convert result to Dict
+        result_dict = json.loads(event.data)
+        # Check if the response is successful
+        if result_dict.get("success") == True and result_dict.get("sessionId") is not None:
+            result = result_dict.get("data", "")
+            # Parse and combine all dictionaries in the list
+            if isinstance(result, list):
+                combined_result = []
+                for item in result:
+                    if isinstance(item, dict):
+                        for key, value in item.items():
+                            combined_result.append(f"{key}: {value}")
+                result = "\n".join(combined_result)
+            self.result = str(result)
+        else:
+            self.result = event.data
+        return True
+
+    def text(self) -> str:
+        import json
+        if self.result:
+            return self.result.strip()
+        if self._last_other is None:
+            return ""
+        try:
+            # Convert result to Dict
+            result_dict = json.loads(self._last_other)
+            return str(result_dict.get("data") or result_dict.get("message") or "").strip()
+        except (json.JSONDecodeError, AttributeError):
+            return self._last_other.strip()
+
+def _yellowcake_verdict_ok(validation_response: str) -> bool:
+    # Gemini answers "Yes"/"No"; "N/A" means the validation call itself failed and we proceed anyway
+    return any(keyword in validation_response.upper() for keyword in ["YES", "N/A"])
+
+def _sse_parser():
+    return _sibling("sse").SSEParser()
+
+# One long-lived HTTP client (and connection pool) for YellowCake streams and URL checks on the event loop
+_async_http_client = None
+HTTP_MAX_CONNECTIONS = int(os.getenv("YELLOWCAKE_MAX_CONNECTIONS", "64"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("YELLOWCAKE_CONNECT_TIMEOUT", "5"))
+
+def get_async_http_client():
+    global _async_http_client
+    if _async_http_client is None:
+        import httpx
+        _async_http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=16)
+        )
+    return _async_http_client
+
+# Startup warmup (see backend/llm/warmup.py) - everything the first request would otherwise pay for
+def preload():
+    """
+    Loads the prompt templates and imports the provider SDKs. Blocking - run it in a worker thread.
+    """
+    import httpx  # noqa: F401
+    from google import genai  # noqa: F401
+    _resources()
+    _url_cache()
+    _sse_parser()
+
+async def warm_gemini_async(model_name: str = "gemini-2.0-flash"):
+    """
+    Creates the shared Gemini client and opens its TLS connection with a model lookup (no tokens used).
+    """
+    client = await get_gemini_client_async()
+    await client.aio.models.get(model=model_name)
+
+async def warm_yellowcake_async():
+    """
+    Opens a pooled TLS connection to YellowCake. Any HTTP status will do; only transport errors fail.
+    """
+    from urllib.parse import urlsplit
+    parts = urlsplit(_resources().yellowcake_url)
+    await get_async_http_client().head(f"{parts.scheme}://{parts.netloc}/")
+
+async def aclose_clients():
+    """
+    Closes the shared HTTP and Gemini clients (on application shutdown).
+    """
+    global _async_http_client, _gemini_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
+    if _gemini_client is not None:
+        aclose = getattr(_gemini_client.aio, "aclose", None)
+        if aclose is not None:
+            await aclose()
+        _gemini_client = None
+
+@_traced("yellowcake.validate", "url")
+async def _validate_for_yellowcake_async(url: str, user_prompt: str, timeout: float) -> bool:
+    """
+    Asks Gemini whether the prompt is a proper YellowCake use case for the URL.
+    """
     try:
-        validation_response = call_gemini(GEMINI_VALIDATION_PROMPT, f"URL: {url}\nPrompt: {user_prompt}")
+        async with _gemini_admission():
+            validation_response = await call_gemini_async(
+                _resources().verify_prompt, f"URL: {url}\nPrompt: {user_prompt}", timeout=timeout
+            )
     except Exception:
         validation_response = "N/A"
-    
-    if any(keyword in validation_response.upper() for keyword in ["YES", "N/A"]):
-        # Proceed with YellowCake processing
-        yellowcake_api_key = os.getenv("YELLOWCAKE_APIKEY")
-        if not yellowcake_api_key:
-            raise ValueError("YellowCake API key not found in environment variables.")
-    
-        # Construct the request for YellowCake API
-        try:
-            from constants import YELLOWCAKE_URL
-        except ImportError:
-            # Probably from main.py which is in another durectory
-            from .constants import YELLOWCAKE_URL
-        import json
-        import re
-
-        headers = {
-            "Content-Type": "application/json",
-            "X-API-Key": yellowcake_api_key
-        }
-        payload = {
-            "url": url,
-            "prompt": user_prompt
-        }
-    
-        try:
-            response = requests.post(YELLOWCAKE_URL, json=payload, headers=headers, stream=True, timeout=30)
-            response.raise_for_status()
-            
-            # Collect the streaming response
-            result = ""
-            other_event_chunks: list[str] = []
-            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
-                STATUS_STRING = "event: complete"
-                if chunk and str(chunk).strip().startswith(STATUS_STRING):
-                    # Remove unnecessary parts like status strings
-                    result = str(chunk).replace(STATUS_STRING, "").replace("data: ", "").strip()
-                    # Convert result to Dict
-                    result_dict = json.loads(result)
-                    # Check if the response is successful
-                    if result_dict.get("success") == True and result_dict.get("sessionId") is not None:
-                        result = result_dict.get("data", "")
-                        # Parse and combine all dictionaries in the list
-                        if isinstance(result, list):
-                            combined_result = []
-                            for item in result:
-                                if isinstance(item, dict):
-                                    for key, value in item.items():
-                                        combined_result.append(f"{key}: {value}")
-                            result = "\n".join(combined_result)
-                        else:
-                            result = str(result)
-                else:
-                    # Remove unnecessary parts like status strings
-                    status_regex = r"event: \w+"
-                    result = re.sub(status_regex, "", str(chunk)).replace("data: ", "").strip('\n').strip()
-                    try:
-                        # Convert result to Dict
-                        result_dict = json.loads(result)
-                        if result_dict.get("data"):
-                            other_event_chunks.append(result_dict.get("data"))
-                        elif result_dict.get("message"):
-                            other_event_chunks.append(result_dict.get("message"))
-                        else:
-                            other_event_chunks.append("")
-                    except json.JSONDecodeError:
-                        other_event_chunks.append(str(result))
-            
-            return result.strip() if result else other_event_chunks[-1].strip()
-        except requests.RequestException as e:
-           return f"Error calling YellowCake API: {str(e)}"
-    else:
-        return "The provided URL is not suitable for YellowCake processing."
+    return _yellowcake_verdict_ok(validation_response)
+
+@_traced("yellowcake.stream", "url")
+async def _stream_yellowcake_async(url: str, user_prompt: str, timeout: float) -> str:
+    """
+    Streams one YellowCake extraction and returns the result text.
+    HTTP errors (connection problems, error statuses) are raised to the caller.
+    """
+    # Construct the request for YellowCake API
+    yellowcake_url, headers, payload = _yellowcake_request(url, user_prompt)
+
+    client = get_async_http_client()
+    async with client.stream("POST", yellowcake_url, json=payload, headers=headers, timeout=timeout) as response:
+        response.raise_for_status()
+
+        parser = _sse_parser()
+        collector = YellowCakeCollector()
+        completed = False
+        async for text in response.aiter_text():
+            if any(collector.add(event) for event in parser.feed(text)):
+                # Nothing after "complete" is needed - leaving the block closes the stream
+                completed = True
+                break
+        if not completed:
+            for event in parser.close():
+                collector.add(event)
+
+    return collector.text()
+
+# Start the YellowCake stream while Gemini is still validating the prompt (see call_yellowcake_async)
+YELLOWCAKE_SPECULATIVE = os.getenv("YELLOWCAKE_SPECULATIVE", "0").lower() in ("1", "true", "yes")
+
+# How speculation is paying off: wasted streams vs validation latency taken off the critical path
+SPECULATION_STATS = {
+    "speculative_calls": 0,
+    "wasted_streams": 0,  # Verdict was "No", so the stream was thrown away
+    "aborted_streams": 0,  # ... of which were still running and got cancelled
+    "wasted_stream_seconds": 0.0,  # YellowCake time spent on thrown-away streams
+    "saved_seconds": 0.0,  # Validation/stream overlap for streams we kept
+}
+
+def speculation_stats() -> dict:
+    return dict(SPECULATION_STATS)
+
+# Call YellowCake - for automating/scraping info from specified URL(s)
+# Parses the stream incrementally on the event loop, no worker thread needed
+@_traced("yellowcake.call", "url", "speculative")
+async def call_yellowcake_async(url: str, user_prompt: str, timeout: float = 30.0, speculative: bool = None):
+    """
+    Validates the prompt with Gemini, then streams the YellowCake extraction.
+    In speculative mode both start together: a "No" verdict aborts the stream,
+    and a finished stream is only returned once the verdict is in.
+    """
+    import asyncio
+    import time
+
+    speculative = YELLOWCAKE_SPECULATIVE if speculative is None else speculative
+    if not speculative:
+        if not await _validate_for_yellowcake_async(url, user_prompt, timeout):
+            return "The provided URL is not suitable for YellowCake processing."
+        return await _stream_yellowcake_async(url, user_prompt, timeout)
+
+    SPECULATION_STATS["speculative_calls"] += 1
+    started_at = time.monotonic()
+    stream_finished_at = None
+
+    def on_stream_done(_):
+        nonlocal stream_finished_at
+        stream_finished_at = time.monotonic()
+
+    stream_task = asyncio.create_task(_stream_yellowcake_async(url, user_prompt, timeout))
+    stream_task.add_done_callback(on_stream_done)
+    try:
+        verdict_ok = await _validate_for_yellowcake_async(url, user_prompt, timeout)
+        verdict_at = time.monotonic()
+        # The stream ran for as long as both were in flight
+        overlap_seconds = (stream_finished_at or verdict_at) - started_at
+        if not verdict_ok:
+            SPECULATION_STATS["wasted_streams"] += 1
+            if not stream_task.done():
+                SPECULATION_STATS["aborted_streams"] += 1
+            SPECULATION_STATS["wasted_stream_seconds"] += overlap_seconds
+            return "The provided URL is not suitable for YellowCake processing."
+
+        # Serially this would have taken validation + stream; the overlap is what we saved
+        SPECULATION_STATS["saved_seconds"] += overlap_seconds
+        return await stream_task
+    finally:
+        stream_task.cancel()
+        if stream_task.done() and not stream_task.cancelled():
+            # A stream that already failed (e.g. no API key) and got thrown away: retrieve its error explicitly
+            # rather than count on cancel() to keep asyncio from logging "Task exception was never retrieved"
+            stream_task.exception()
+
+# Multi-URL YellowCake scraping (see scrape_urls_async)
+YELLOWCAKE_MAX_URLS = int(os.getenv("YELLOWCAKE_MAX_URLS", "5"))  # Valid URLs scraped per prompt
+YELLOWCAKE_URL_CONCURRENCY = int(os.getenv("YELLOWCAKE_URL_CONCURRENCY", "3"))  # Pages scraped at once
+YELLOWCAKE_URL_TIMEOUT = float(os.getenv("YELLOWCAKE_URL_TIMEOUT", "30"))  # Deadline per page (seconds)
+
+def order_urls(text: str, urls) -> list[str]:
+    """
+    Puts valid URLs in a deterministic order: as they appear in the text first,
+    then any others (e.g. Gemini suggestions) alphabetically.
+    """
+    urls = set(urls)
+    in_text = [url for url in _url_candidates(_extract_urls(text)) if url in urls]
+    return in_text + sorted(urls.difference(in_text))
+
+async def scrape_urls_async(urls, user_prompt: str, on_page=None, concurrency: int = None, timeout: float = None, max_urls: int = None) -> list[dict]:
+    """
+    Runs call_yellowcake_async for every URL, at most `concurrency` at a time,
+    each with its own deadline (counted once the page gets a slot).
+    `urls` is a list or an async iterator (e.g. iter_valid_urls_async); an iterator's URLs start scraping
+    as they arrive, so scraping overlaps validation. At most max_urls URLs are scraped (None = all).
+    on_page(page) is called as each page finishes. Returns the pages in the order their URLs came in;
+    each is {"url", "index", "elapsed"} plus either "response" or "error".
+    If no page could be scraped and one failed with an HTTP error, that error is raised instead,
+    so the caller can tell a YellowCake outage from a bad page.
+    """
+    import asyncio
+    import time
+    import httpx
+    concurrency = YELLOWCAKE_URL_CONCURRENCY if concurrency is None else concurrency
+    timeout = YELLOWCAKE_URL_TIMEOUT if timeout is None else timeout
+    slots = asyncio.Semaphore(max(1, concurrency))
+    http_errors = []
+
+    async def scrape(index, url):
+        async with slots:
+            started_at = time.monotonic()
+            page = {"url": url, "index": index}
+            try:
+                page["response"] = await asyncio.wait_for(call_yellowcake_async(url, user_prompt, timeout=timeout), timeout)
+            except asyncio.TimeoutError:
+                page["error"] = f"Timed out after {timeout:g} seconds."
+            except Exception as e:
+                page["error"] = f"YellowCake processing error: {str(e)}"
+                if isinstance(e, httpx.HTTPError):
+                    http_errors.append(e)
+            page["elapsed"] = round(time.monotonic() - started_at, 3)
+        if on_page is not None:
+            on_page(page)
+        return page
+
+    tasks = []
+    try:
+        if hasattr(urls, "__aiter__"):
+            async for url in urls:
+                tasks.append(asyncio.create_task(scrape(len(tasks), url)))
+                if max_urls is not None and len(tasks) >= max_urls:
+                    break
+        else:
+            tasks = [asyncio.create_task(scrape(index, url)) for index, url in enumerate(urls[:max_urls])]
+        pages = list(await asyncio.gather(*tasks))
+        if http_errors and not any("response" in page for page in pages):
+            raise http_errors[0]
+        return pages
+    finally:
+        for task in tasks:
+            task.cancel()
+        if hasattr(urls, "aclose"):
+            # Stops the URL checks still running once we have enough URLs (or were cancelled)
+            await urls.aclose()
+
+def merge_pages(pages: list[dict]) -> str:
+    """
+    Combines the scraped pages into one result, one section per successful URL.
+    """
+    scraped = [page for page in pages if "response" in page]
+    if len(pages) == 1 and scraped:
+        return scraped[0]["response"]
+    return "\n\n".join(f"[{page['url']}]\n{page['response']}" for page in scraped)
+
+async def _main():
+    from dotenv import load_dotenv
+    load_dotenv()
 
-if __name__ == "__main__":
     sample_text = """
     Here are some links you might find useful:
     https://www.example.com
@@ -168,10 +653,17 @@ if __name__ == "__main__":
     https://docs.yellowcake.dev/
     Check them out!
     """
-    valid_urls = get_valid_urls(sample_text)
-    print("Valid URLs found:", valid_urls)
+    try:
+        valid_urls = await get_valid_urls_async(sample_text)
+        print("Valid URLs found:", valid_urls)
 
-    # Try to call YellowCake on a sample URL
-    for url in valid_urls:
-        result = call_yellowcake(url, "Summarize the content of this webpage.")
-        print(f"YellowCake result for {url}:\n{result}\n")
\ No newline at end of file
+        # Try to call YellowCake on the valid URLs
+        pages = await scrape_urls_async(order_urls(sample_text, valid_urls), "Summarize the content of this webpage.")
+        for page in pages:
+            print(f"YellowCake result for {page['url']}:\n{page.get('response', page.get('error'))}\n")
+    finally:
+        await aclose_clients()
+
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(_main())
@@ -0,0 +1,39 @@
+import importlib
+import threading
+from pathlib import Path
+from typing import NamedTuple
+
+MODEL_DIR = Path(__file__).parent
+
+class Resources(NamedTuple):
+    """
+    Everything the provider calls read from disk, loaded once and never mutated.
+    """
+    url_parsing_prompt: str
+    verify_prompt: str
+    yellowcake_url: str
+
+_resources = None
+_resources_lock = threading.Lock()
+
+def _read_prompt(name: str) -> str:
+    with open(MODEL_DIR / name, "r") as f:
+        return f.read()
+
+def load_resources() -> Resources:
+    """
+    Returns the shared resource registry, reading the prompt templates on first use.
+    Safe to call from worker threads; startup warmup calls it so requests never touch the disk.
+    """
+    global _resources
+    if _resources is None:
+        with _resources_lock:
+            if _resources is None:
+                # As part of the model package, or run from the model directory
+                constants = importlib.import_module(f"{__package__}.constants" if __package__ else "constants")
+                _resources = Resources(
+                    url_parsing_prompt=_read_prompt("PROMPT_GEMINI_URL_PARSING.txt"),
+                    verify_prompt=_read_prompt("PROMPT_GEMINI_VERIFY_PROMPT.txt"),
+                    yellowcake_url=constants.YELLOWCAKE_URL,
+                )
+    return _resources
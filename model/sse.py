@@ -0,0 +1,97 @@
+import re
+from typing import NamedTuple, Optional
+
+# SSE lines end with CRLF, LF or CR
+LINE_END = re.compile(r'\r\n|\r|\n')
+
+class SSEEvent(NamedTuple):
+    event: str
+    data: str
+    id: Optional[str] = None
+
+class SSEParser:
+    """
+    Incremental text/event-stream parser (https://html.spec.whatwg.org/multipage/server-sent-events.html).
+    Feed it text as it arrives from the network; events may span any number of chunks.
+    """
+
+    def __init__(self):
+        self._pieces = []  # Text of the current, unterminated line
+        self._skip_lf = False  # The last chunk ended in CR, so a leading LF belongs to it
+        self._event = ""
+        self._data = []
+        self._last_id = None
+
+    def feed(self, text: str) -> list:
+        """
+        Consumes a chunk of text and returns the events it completed.
+        """
+        if self._skip_lf:
+            self._skip_lf = False
+            if text.startswith("\n"):
+                text = text[1:]
+
+        # Only the new text is scanned, so a long line arriving in many chunks stays linear
+        last_end = max(text.rfind("\r"), text.rfind("\n"))
+        if last_end < 0:
+            self._pieces.append(text)
+            return []
+
+        self._pieces.append(text[:last_end + 1])
+        block = "".join(self._pieces)
+        rest = text[last_end + 1:]
+        self._pieces = [rest] if rest else []
+        if block.endswith("\r"):
+            self._skip_lf = True
+
+        # Plain str.split is much faster than the regex on the common LF-only stream
+        lines = LINE_END.split(block) if "\r" in block else block.split("\n")
+        # The block ends with a line ending, so the last piece is always empty
+        lines.pop()
+
+        events = []
+        for line in lines:
+            event = self._process_line(line)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def close(self) -> list:
+        """
+        Flushes the stream. Unlike the spec, a final event without a trailing blank line is
+        still dispatched, since some servers close the connection right after the last data line.
+        """
+        events = self.feed("\n") if self._pieces else []
+        event = self._dispatch()
+        if event is not None:
+            events.append(event)
+        return events
+
+    def _process_line(self, line):
+        if line == "":
+            return self._dispatch()
+        if line.startswith(":"):
+            # Comment / keep-alive
+            return None
+
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+
+        if field == "event":
+            self._event = value
+        elif field == "data":
+            self._data.append(value)
+        elif field == "id" and "\0" not in value:
+            self._last_id = value
+        # "retry" and unknown fields are ignored
+        return None
+
+    def _dispatch(self):
+        if not self._data:
+            self._event = ""
+            return None
+        event = SSEEvent(self._event or "message", "\n".join(self._data), self._last_id)
+        self._event = ""
+        self._data = []
+        return event
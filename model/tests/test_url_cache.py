@@ -0,0 +1,63 @@
+import sys
+import time
+from pathlib import Path
+
+# The model modules import each other by plain name when run from the model directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import external_api
+from url_cache import URLCheck, URLValidationCache
+
+def test_fresh_entry_is_served():
+    cache = URLValidationCache(valid_ttl=60)
+    cache.put(URLCheck("https://Example.com", "valid", status=200, checked_at=time.time()))
+
+    assert cache.get("https://example.com/").valid
+
+def test_expired_valid_entry_is_revalidated_with_its_validators():
+    cache = URLValidationCache(valid_ttl=60)
+    etag, last_modified = '"v1"', "Wed, 01 Jan 2025 00:00:00 GMT"
+    cache.put(URLCheck(
+        "https://example.com/page", "valid", status=200, etag=etag, last_modified=last_modified,
+        checked_at=time.time() - 120,
+    ))
+
+    # Expired: a fresh check is needed, but the entry is still there to revalidate
+    assert cache.get("https://example.com/page") is None
+    stale = cache.stale("https://example.com/page")
+    assert stale is not None and stale.etag == etag
+    assert external_api._conditional_headers(stale) == {"If-None-Match": etag, "If-Modified-Since": last_modified}
+
+def test_not_modified_answer_renews_the_entry(monkeypatch):
+    cache = URLValidationCache(valid_ttl=60)
+    monkeypatch.setattr(external_api, "_url_cache", lambda: cache)
+    cache.put(URLCheck("https://example.com/page", "valid", status=200, etag='"v1"', checked_at=time.time() - 120))
+
+    stale = cache.stale("https://example.com/page")
+    assert external_api._record_response("https://example.com/page", 304, "https://example.com/page", {}, stale)
+
+    renewed = cache.get("https://example.com/page")
+    assert renewed is not None and renewed.status == 304 and renewed.etag == '"v1"'
+
+def test_expired_invalid_entry_is_dropped():
+    cache = URLValidationCache(invalid_ttl=60)
+    cache.put(URLCheck("https://example.com/missing", "invalid", status=404, checked_at=time.time() - 120))
+
+    assert cache.get("https://example.com/missing") is None
+    assert cache.stale("https://example.com/missing") is None
+    assert cache.stats()["entries"] == 0
+
+def test_failed_host_fails_its_other_urls():
+    cache = URLValidationCache(host_failure_ttl=60)
+    cache.put(URLCheck("https://down.example/a", "timeout", checked_at=time.time()), host_failed=True)
+
+    assert cache.get("https://down.example/b").outcome == "host_down"
+
+def test_dead_hosts_are_capped():
+    cache = URLValidationCache(max_entries=3)
+    for i in range(10):
+        cache.put(URLCheck(f"https://host{i}.example/", "timeout", checked_at=time.time()), host_failed=True)
+
+    assert cache.stats()["dead_hosts"] == 3
+    assert cache.get("https://host9.example/other").outcome == "host_down"
+    assert cache.get("https://host0.example/other") is None
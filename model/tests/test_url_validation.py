@@ -0,0 +1,40 @@
+import sys
+import asyncio
+from pathlib import Path
+
+import httpx
+
+# The model modules import each other by plain name when run from the model directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import external_api
+from url_cache import URLValidationCache
+
+def _valid_urls(monkeypatch, text):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+    cache = URLValidationCache()
+    monkeypatch.setattr(external_api, "get_async_http_client", lambda: client)
+    monkeypatch.setattr(external_api, "_url_cache", lambda: cache)
+
+    async def run():
+        try:
+            return await external_api.get_valid_urls_async(text, gemini_policy="never", enough=0)
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+def test_malformed_url_does_not_sink_the_batch(monkeypatch):
+    valid = _valid_urls(monkeypatch, "Compare https://example.com:abc/ with https://example.com")
+
+    assert valid == ["https://example.com"]
+
+def test_check_that_raises_counts_as_invalid(monkeypatch):
+    async def broken_check(client, url, host_limit):
+        if "broken" in url:
+            raise RuntimeError("unexpected")
+        return True
+    monkeypatch.setattr(external_api, "_check_url_async", broken_check)
+
+    valid = _valid_urls(monkeypatch, "See https://broken.example.com and https://example.com")
+
+    assert valid == ["https://example.com"]
@@ -0,0 +1,116 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+class URLCheck(NamedTuple):
+    url: str
+    outcome: str  # "valid", "invalid", "timeout" or "host_down"
+    status: Optional[int] = None
+    final_url: Optional[str] = None  # Where the redirects ended up
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    checked_at: float = 0.0
+
+    @property
+    def valid(self) -> bool:
+        return self.outcome == "valid"
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical cache key: lowercase scheme and host, no default port, no fragment, "/" for an empty path.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    return urlunsplit((scheme, host, parts.path or "/", parts.query, ""))
+
+class URLValidationCache:
+    """
+    Remembers URL validation results with separate TTLs for valid, invalid and timed-out URLs,
+    plus a per-host failure memory so URLs on a host that just refused or timed out fail immediately.
+    Thread-safe, so it can also be used outside the event loop.
+    """
+
+    def __init__(self, valid_ttl=3600.0, invalid_ttl=600.0, timeout_ttl=120.0, host_failure_ttl=300.0, max_entries=4096):
+        self.ttls = {"valid": valid_ttl, "invalid": invalid_ttl, "timeout": timeout_ttl}
+        self.host_failure_ttl = host_failure_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # normalized url -> URLCheck
+        self._dead_hosts = OrderedDict()  # host -> time the failure was seen (capped at max_entries too)
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[URLCheck]:
+        """
+        Returns the cached check for the URL, a "host_down" check if its host recently failed, or None.
+        Expired valid entries are kept (until LRU eviction), so stale() can still revalidate them.
+        """
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            check = self._entries.get(key)
+            if check is not None:
+                if now - check.checked_at <= self.ttls[check.outcome]:
+                    self._entries.move_to_end(key)
+                    return check
+                if not check.valid:
+                    del self._entries[key]
+
+            host = urlsplit(key).netloc
+            failed_at = self._dead_hosts.get(host)
+            if failed_at is not None:
+                if now - failed_at <= self.host_failure_ttl:
+                    return URLCheck(url, "host_down", checked_at=failed_at)
+                del self._dead_hosts[host]
+        return None
+
+    def stale(self, url: str) -> Optional[URLCheck]:
+        """
+        Returns an expired valid entry (if still stored), so its ETag/Last-Modified can be used to revalidate.
+        """
+        with self._lock:
+            check = self._entries.get(normalize_url(url))
+        return check if check is not None and check.valid else None
+
+    def put(self, check: URLCheck, host_failed: bool = False):
+        """
+        Stores a fresh check. host_failed marks the whole host as down (connection error or timeout).
+        """
+        key = normalize_url(check.url)
+        with self._lock:
+            self._entries[key] = check
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+            host = urlsplit(key).netloc
+            if host_failed:
+                self._dead_hosts[host] = check.checked_at
+                self._dead_hosts.move_to_end(host)
+                while len(self._dead_hosts) > self.max_entries:
+                    self._dead_hosts.popitem(last=False)
+            else:
+                # Any answer at all means the host is up
+                self._dead_hosts.pop(host, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            outcomes = {}
+            for check in self._entries.values():
+                outcomes[check.outcome] = outcomes.get(check.outcome, 0) + 1
+            return {"entries": len(self._entries), "by_outcome": outcomes, "dead_hosts": len(self._dead_hosts)}
+
+# Shared by every request in this process
+url_validation_cache = URLValidationCache(
+    valid_ttl=float(os.getenv("URL_CACHE_VALID_TTL", "3600")),
+    invalid_ttl=float(os.getenv("URL_CACHE_INVALID_TTL", "600")),
+    timeout_ttl=float(os.getenv("URL_CACHE_TIMEOUT_TTL", "120")),
+    host_failure_ttl=float(os.getenv("URL_HOST_FAILURE_TTL", "300")),
+    max_entries=int(os.getenv("URL_CACHE_MAX_ENTRIES", "4096")),
+)